@@ -9,7 +9,7 @@ DEFAULT_REPO="${SLIDESHOW_MANAGER_DEFAULT_REPO:-https://github.com/joni123467/Sl
 BRANCH="${SLIDESHOW_MANAGER_BRANCH:-main}"
 SERVICE_USER="${SLIDESHOW_MANAGER_USER:-slideshowmgr}"
 TMP_DIR=""
-declare -a PERSISTENT_PATHS=("slideshow_manager/data/devices.json")
+declare -a PERSISTENT_PATHS=("slideshow_manager/data/devices.json" "slideshow_manager/data/schedules.json" "slideshow_manager/data/schedules_history.jsonl" "slideshow_manager/data/audit.sqlite3")
 
 cleanup() {
   if [[ -n "${TMP_DIR}" && -d "${TMP_DIR}" ]]; then
@@ -25,9 +25,19 @@ source "${VENV_DIR}/bin/activate"
 PORT="${SLIDESHOW_MANAGER_PORT:-5000}"
 WORKERS="${SLIDESHOW_MANAGER_WORKERS:-3}"
 LOG_LEVEL="${SLIDESHOW_MANAGER_LOG_LEVEL:-info}"
+PRELOAD="${SLIDESHOW_MANAGER_PRELOAD:-0}"
+
+declare -a EXTRA_ARGS=()
+if [[ "${PRELOAD}" == "1" ]]; then
+  # App einmal im Master laden; Worker übernehmen sie per fork.
+  export PRELOAD_APP=1
+  EXTRA_ARGS+=(--preload)
+fi
 
 exec gunicorn \
   --bind "0.0.0.0:${PORT}" \
   --workers "${WORKERS}" \
   --log-level "${LOG_LEVEL}" \
+  --config "python:slideshow_manager.gunicorn_config" \
+  ${EXTRA_ARGS[@]+"${EXTRA_ARGS[@]}"} \
   "slideshow_manager:create_app()"
@@ -1,31 +1,125 @@
-"""Application factory for the Slideshow Manager dashboard."""
+"""Application factory for the Slideshow Manager dashboard.
+
+Every CLI command imports this package too (``python -m`` loads it before
+``__main__``), so Flask, the blueprints and the scheduler are only imported
+inside :func:`create_app`.
+"""
 from __future__ import annotations
 
-from flask import Flask
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .storage import DEFAULT_STORAGE_PATH
+
+if TYPE_CHECKING:  # pragma: no cover - imported in create_app()
+    from flask import Flask
 
-from .auth import bp as auth_bp
-from .views import bp as dashboard_bp
-from .storage import DeviceStorage
+
+# Settings that may be supplied through /etc/slideshow-manager.env.
+ENV_CONFIG_KEYS = (
+    "REMOTE_TRANSPORT",
+    "GATEWAY_URL",
+    "GATEWAY_TOKEN",
+    "GATEWAY_DEADLINE",
+    "SCHEDULER_ENABLED",
+    "PRELOAD_APP",
+    "CACHE_BACKEND",
+    "CACHE_PATH",
+    "AUDIT_PATH",
+)
 
 
 def create_app(config: dict | None = None) -> Flask:
+    from flask import Flask
+
+    from .audit import AuditLog, bp as audit_bp
+    from .auth import bp as auth_bp
+    from .cache import create_cache
+    from .discovery import bp as discovery_bp
+    from .inventory import bp as inventory_bp
+    from .media import MediaBrowser
+    from .scheduler import ScheduleStorage, bp as schedules_bp
+    from .storage import DeviceStorage
+    from .views import bp as dashboard_bp
+
     app = Flask(__name__)
     app.config.from_mapping(
         SECRET_KEY="change-me",
-        STORAGE_PATH="slideshow_manager/data/devices.json",
+        STORAGE_PATH=DEFAULT_STORAGE_PATH,
         AUTH_MODE="pam",
         TEST_USERS={},
         REMOTE_TIMEOUT=8,
+        REMOTE_TRANSPORT="direct",
+        GATEWAY_URL="",
+        GATEWAY_TOKEN="",
+        GATEWAY_DEADLINE=20,
+        SCHEDULE_PATH=None,
+        SCHEDULER_ENABLED=False,
+        SCHEDULER_CATCHUP_SECONDS=900,
+        SCHEDULER_POLL_INTERVAL=30,
+        SCHEDULE_HISTORY_LIMIT=50,
+        SCHEDULE_HISTORY_MAX_BYTES=5 * 1024 * 1024,
+        DISCOVERY_TIMEOUT=0.5,
+        DISCOVERY_WORKERS=128,
+        DISCOVERY_MAX_HOSTS=4096,
+        DISCOVERY_MAX_PROBES=4096,
+        DISCOVERY_MAX_SCANS=1,
+        MEDIA_LISTING_TTL=300,
+        MEDIA_PAGE_SIZE=60,
+        PREVIEW_CACHE_TTL=600,
+        PREVIEW_ERROR_TTL=60,
+        STATE_CACHE_TTL=5,
+        CACHE_BACKEND="sqlite",
+        CACHE_PATH=None,
+        CACHE_MAX_ENTRIES=5000,
+        CACHE_MAX_BYTES=128 * 1024 * 1024,
+        AUDIT_PATH=None,
+        AUDIT_BATCH_SIZE=100,
+        AUDIT_FLUSH_INTERVAL=1.0,
+        AUDIT_PAGE_SIZE=200,
+        PRELOAD_APP=False,
     )
 
+    app.config.update({key: os.environ[key] for key in ENV_CONFIG_KEYS if key in os.environ})
     if config:
         app.config.update(config)
 
     storage = DeviceStorage(app.config["STORAGE_PATH"])
     app.storage = storage  # type: ignore[attr-defined]
 
+    app.cache = create_cache(app.config)  # type: ignore[attr-defined]
+    app.media_browser = MediaBrowser(  # type: ignore[attr-defined]
+        app.cache,  # type: ignore[attr-defined]
+        listing_ttl=float(app.config["MEDIA_LISTING_TTL"]),
+        preview_ttl=float(app.config["PREVIEW_CACHE_TTL"]),
+        preview_error_ttl=float(app.config["PREVIEW_ERROR_TTL"]),
+    )
+
+    schedule_path = app.config["SCHEDULE_PATH"] or Path(app.config["STORAGE_PATH"]).with_name("schedules.json")
+    app.schedules = ScheduleStorage(  # type: ignore[attr-defined]
+        str(schedule_path), history_max_bytes=int(app.config["SCHEDULE_HISTORY_MAX_BYTES"])
+    )
+
+    audit_path = app.config["AUDIT_PATH"] or Path(app.config["STORAGE_PATH"]).with_name("audit.sqlite3")
+    app.audit = AuditLog(  # type: ignore[attr-defined]
+        str(audit_path),
+        batch_size=int(app.config["AUDIT_BATCH_SIZE"]),
+        flush_interval=float(app.config["AUDIT_FLUSH_INTERVAL"]),
+    )
+
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(schedules_bp)
+    app.register_blueprint(discovery_bp)
+    app.register_blueprint(inventory_bp)
+    app.register_blueprint(audit_bp)
+
+    app.scheduler = None  # type: ignore[attr-defined]
+    # With gunicorn --preload threads must not be started in the master;
+    # init_worker() starts them after the fork instead.
+    if not _as_bool(app.config["PRELOAD_APP"]):
+        _start_background_services(app)
 
     @app.context_processor
     def inject_globals():
@@ -36,4 +130,30 @@ def create_app(config: dict | None = None) -> Flask:
     return app
 
 
-__all__ = ["create_app"]
+def init_worker(app: Flask) -> None:
+    """Re-initialise per-process state in a worker forked from a preloaded app."""
+
+    from .clients import reset_sessions
+
+    app.storage.after_fork()  # type: ignore[attr-defined]
+    app.schedules.after_fork()  # type: ignore[attr-defined]
+    app.cache.after_fork()  # type: ignore[attr-defined]
+    app.audit.after_fork()  # type: ignore[attr-defined]
+    reset_sessions()
+    _start_background_services(app)
+
+
+def _start_background_services(app: Flask) -> None:
+    if _as_bool(app.config["SCHEDULER_ENABLED"]):
+        from .scheduler import start_scheduler
+
+        app.scheduler = start_scheduler(app)  # type: ignore[attr-defined]
+
+
+def _as_bool(value: object) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "on"}
+    return bool(value)
+
+
+__all__ = ["create_app", "init_worker"]
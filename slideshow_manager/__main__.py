@@ -1,7 +1,170 @@
-from . import create_app
+"""Command line entry point: ``python -m slideshow_manager [command]``."""
+from __future__ import annotations
 
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+from .storage import DEFAULT_STORAGE_PATH
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from . import create_app
+
+    app = create_app({"STORAGE_PATH": args.storage})
+    app.run(host=args.host, port=args.port)
+    return 0
+
+
+def _export(args: argparse.Namespace) -> int:
+    from .inventory import detect_format, export_rows
+    from .storage import DeviceStorage
+
+    fmt = detect_format(args.output, args.format) if args.output != "-" else (args.format or "csv")
+    storage = DeviceStorage(args.storage)
+    rows = export_rows(storage.iter_devices(), fmt, include_passwords=not args.without_passwords)
+    if args.output == "-":
+        sys.stdout.writelines(rows)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as handle:
+            handle.writelines(rows)
+    return 0
+
+
+def _import(args: argparse.Namespace) -> int:
+    import getpass
+    from pathlib import Path
+
+    from .audit import AuditLog
+    from .inventory import detect_format, import_devices
+    from .storage import DeviceStorage
+
+    fmt = detect_format(args.file, args.format)
+    storage = DeviceStorage(args.storage)
+    if args.file == "-":
+        report = import_devices(storage, sys.stdin, fmt)
+    else:
+        with open(args.file, "r", encoding="utf-8-sig", newline="") as handle:
+            report = import_devices(storage, handle, fmt)
+    # Same audit database as the web app (AUDIT_PATH or next to the inventory).
+    log = AuditLog(os.environ.get("AUDIT_PATH") or str(Path(args.storage).with_name("audit.sqlite3")))
+    try:
+        report.record_changes(log.record, user=getpass.getuser(), payload={"file": args.file, "via": "cli"})
+    finally:
+        log.close()
+    for row, message in report.errors:
+        print(f"Zeile {row}: {message}", file=sys.stderr)
+    print(f"{report.created} angelegt, {report.updated} aktualisiert, {len(report.errors)} Fehler")
+    return 0 if report.ok else 1
+
+
+def _startup(args: argparse.Namespace) -> int:
+    from .startup import import_profile, measure
+
+    results = measure(args.runs)
+    for label, values in results.items():
+        print(f"{label}: min {values['min']:.1f} · median {values['median']:.1f} · max {values['max']:.1f}")
+    if args.profile:
+        print("\nLangsamste Importe (kumulativ, ms):")
+        for cumulative, module in import_profile(args.profile):
+            print(f"{cumulative / 1000:8.1f}  {module}")
+    return 0
+
+
+def _loadtest(args: argparse.Namespace) -> int:
+    from .loadtest import format_report, parse_stages, run
+
+    try:
+        stages = parse_stages(args.stages)
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    report, manager_url = run(
+        stages,
+        args.stage_seconds,
+        players=args.players,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        bulk_size=args.bulk_size,
+        interval=args.interval,
+        manager_url=args.url,
+        user=args.user,
+        password=args.password,
+        pids=args.pid or None,
+        farm_host=args.farm_host,
+        workers=args.workers,
+        preload=args.preload,
+    )
+    print(f"Manager: {manager_url} · {args.players} simulierte Player\n")
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report.to_dict(), handle, indent=2)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m slideshow_manager")
+    parser.add_argument("--storage", default=DEFAULT_STORAGE_PATH, help="Pfad zur devices.json")
+    commands = parser.add_subparsers(dest="command")
+
+    serve = commands.add_parser("serve", help="Entwicklungsserver starten (Standard)")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=5000)
+    serve.set_defaults(handler=_serve)
+
+    export = commands.add_parser("export", help="Geräteinventar exportieren")
+    export.add_argument("--format", choices=["csv", "jsonl"])
+    export.add_argument("--output", "-o", default="-", help="Zieldatei oder - für stdout")
+    export.add_argument("--without-passwords", action="store_true")
+    export.set_defaults(handler=_export)
+
+    importer = commands.add_parser("import", help="Geräteinventar importieren")
+    importer.add_argument("file", help="CSV- oder JSON-Lines-Datei, - für stdin")
+    importer.add_argument("--format", choices=["csv", "jsonl"])
+    importer.set_defaults(handler=_import)
+
+    startup = commands.add_parser("startup", help="Startzeit von create_app messen")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--profile", type=int, default=0, metavar="N", help="die N langsamsten Importe anzeigen")
+    startup.set_defaults(handler=_startup)
+
+    loadtest = commands.add_parser("loadtest", help="Last- und Dauertest gegen simulierte Player")
+    loadtest.add_argument("--stages", default="1,2,4,8,16", help="gleichzeitige Bediener je Stufe, z. B. 1,2,4,8")
+    loadtest.add_argument("--stage-seconds", type=float, default=30, help="Dauer jeder Stufe in Sekunden")
+    loadtest.add_argument("--players", type=int, default=50, help="Anzahl simulierter Player")
+    loadtest.add_argument("--latency", type=float, default=0.02, help="mittlere Antwortzeit der Player in Sekunden")
+    loadtest.add_argument("--error-rate", type=float, default=0.0, help="Anteil fehlerhafter Player-Antworten (0–1)")
+    loadtest.add_argument("--bulk-size", type=int, default=5, help="Geräte pro Sammelaktion")
+    loadtest.add_argument("--interval", type=float, default=10, help="Intervall des Zeitverlaufs in Sekunden")
+    loadtest.add_argument(
+        "--url", help="laufenden Manager testen statt eine lokale Instanz zu starten (Testgeräte werden danach gelöscht)"
+    )
+    loadtest.add_argument(
+        "--farm-host", default="127.0.0.1", help="Adresse der simulierten Player, die der Manager erreichen kann"
+    )
+    loadtest.add_argument("--user", default="loadtest")
+    loadtest.add_argument("--password", default="loadtest")
+    loadtest.add_argument("--pid", type=int, action="append", help="Prozess-ID eines Workers für die Speichermessung")
+    loadtest.add_argument("--workers", type=int, default=3, help="Gunicorn-Worker des lokalen Managers")
+    loadtest.add_argument("--preload", action="store_true", help="lokalen Manager mit --preload starten")
+    loadtest.add_argument("--json", help="Bericht zusätzlich als JSON speichern")
+    loadtest.set_defaults(handler=_loadtest)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(["--storage", args.storage, "serve"])
+
+    from .inventory import InventoryError
+
+    try:
+        return args.handler(args)
+    except InventoryError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
 
-app = create_app()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Append-only audit log of device actions and inventory changes.
+
+Entries are queued in memory by the request thread and written to a
+SQLite database in batches by a background writer, so recording an action
+costs a queue put instead of a disk write. The table is indexed by device
+and time for the audit view's filters.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from flask import Blueprint, Response, current_app, g, render_template, request
+
+from .auth import login_required
+
+
+bp = Blueprint("audit", __name__)
+logger = logging.getLogger(__name__)
+
+_MASKED_FIELDS = {"password"}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS audit ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " ts REAL NOT NULL,"
+    " user TEXT,"
+    " device_id TEXT,"
+    " action TEXT NOT NULL,"
+    " payload TEXT,"
+    " diff TEXT,"
+    " result TEXT NOT NULL,"
+    " message TEXT,"
+    " latency_ms REAL)",
+    "CREATE INDEX IF NOT EXISTS audit_device_ts ON audit (device_id, ts)",
+    "CREATE INDEX IF NOT EXISTS audit_ts ON audit (ts)",
+)
+
+_COLUMNS = ("ts", "user", "device_id", "action", "payload", "diff", "result", "message", "latency_ms")
+
+
+def _mask(data: Mapping[str, Any]) -> Dict[str, Any]:
+    return {key: ("***" if key in _MASKED_FIELDS and value else value) for key, value in data.items()}
+
+
+def diff_dicts(before: Optional[Mapping[str, Any]], after: Optional[Mapping[str, Any]]) -> Dict[str, List[Any]]:
+    """Return ``{field: [old, new]}`` for every changed field, masking passwords."""
+
+    before = before or {}
+    after = after or {}
+    changes: Dict[str, List[Any]] = {}
+    for key in sorted(set(before) | set(after)):
+        old, new = before.get(key), after.get(key)
+        if old != new:
+            if key in _MASKED_FIELDS:
+                old, new = ("***" if old else old), ("***" if new else new)
+            changes[key] = [old, new]
+    return changes
+
+
+class AuditLog:
+    """SQLite audit log with a batching background writer."""
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 1.0, retries: int = 3) -> None:
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connect()
+        try:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+        finally:
+            connection.close()
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self) -> None:
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._start_lock = threading.Lock()
+
+    def after_fork(self) -> None:
+        """Start with an empty queue; the writer thread did not survive the fork."""
+
+        self._reset()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+
+    def _ensure_writer(self) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="slideshow-audit", daemon=True)
+                self._thread.start()
+
+    def record(
+        self,
+        action: str,
+        *,
+        user: Optional[str] = None,
+        device_id: Optional[str] = None,
+        payload: Optional[Mapping[str, Any]] = None,
+        diff: Optional[Mapping[str, Any]] = None,
+        result: str = "ok",
+        message: str = "",
+        latency_ms: Optional[float] = None,
+    ) -> None:
+        """Queue an entry; it is written by the background writer."""
+
+        self._ensure_writer()
+        self._queue.put(
+            (
+                time.time(),
+                user,
+                device_id,
+                action,
+                json.dumps(_mask(payload), ensure_ascii=False, default=str) if payload else None,
+                json.dumps(diff, ensure_ascii=False, default=str) if diff else None,
+                result,
+                message,
+                latency_ms,
+            )
+        )
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until every entry queued so far has been written."""
+
+        self._ensure_writer()
+        marker = threading.Event()
+        self._queue.put(marker)
+        marker.wait(timeout)
+
+    def close(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        connection = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch: List[Any] = [item]
+                deadline = time.monotonic() + self.flush_interval
+                # Collect more entries until the batch is full or the interval ends.
+                while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                rows = [entry for entry in batch if isinstance(entry, tuple)]
+                if rows:
+                    self._write(connection, rows)
+                for entry in batch:
+                    if isinstance(entry, threading.Event):
+                        entry.set()
+                if batch[-1] is None:
+                    return
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, rows: List[tuple]) -> bool:
+        """Insert ``rows`` in one transaction, retrying on database errors.
+
+        A batch that still fails after ``retries`` attempts is logged with
+        its entries and dropped, so the writer thread stays alive.
+        """
+
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        for attempt in range(1, self.retries + 1):
+            try:
+                connection.execute("BEGIN")
+                connection.executemany(f"INSERT INTO audit ({', '.join(_COLUMNS)}) VALUES ({placeholders})", rows)
+                connection.execute("COMMIT")
+                return True
+            except sqlite3.Error as exc:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                if attempt < self.retries:
+                    logger.warning("Audit-Schreiben fehlgeschlagen (Versuch %d): %s", attempt, exc)
+                    time.sleep(0.2 * attempt)
+                else:
+                    logger.error("%d Audit-Einträge verworfen: %s; %r", len(rows), exc, rows)
+        return False
+
+    def query(
+        self,
+        device_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 200,
+    ) -> List[Dict[str, Any]]:
+        """Newest entries first, filtered by device and time range."""
+
+        clauses: List[str] = []
+        params: List[Any] = []
+        if device_id:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM audit {where} ORDER BY ts DESC, id DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        finally:
+            connection.close()
+        entries = []
+        for row in rows:
+            entry = dict(zip(_COLUMNS, row))
+            entry["payload"] = json.loads(entry["payload"]) if entry["payload"] else None
+            entry["diff"] = json.loads(entry["diff"]) if entry["diff"] else None
+            entry["time"] = datetime.fromtimestamp(entry["ts"])
+            entries.append(entry)
+        return entries
+
+
+def audit(action: str, **fields: Any) -> None:
+    """Record an entry for the logged-in user of the current request."""
+
+    fields.setdefault("user", g.get("user"))
+    current_app.audit.record(action, **fields)  # type: ignore[attr-defined]
+
+
+def _parse_date(value: Optional[str], end_of_day: bool = False) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        moment = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return None
+    return moment.timestamp() + (86400 if end_of_day else 0)
+
+
+@bp.route("/audit")
+@login_required
+def audit_log() -> Response:
+    log = current_app.audit  # type: ignore[attr-defined]
+    log.flush()
+    filters = {
+        "device": request.args.get("device", ""),
+        "since": request.args.get("since", ""),
+        "until": request.args.get("until", ""),
+    }
+    entries = log.query(
+        device_id=filters["device"] or None,
+        since=_parse_date(filters["since"]),
+        until=_parse_date(filters["until"], end_of_day=True),
+        limit=int(current_app.config.get("AUDIT_PAGE_SIZE", 200)),
+    )
+    devices = {device.id: device for device in current_app.storage.list_devices()}  # type: ignore[attr-defined]
+    return render_template("audit.html", entries=entries, devices=devices, filters=filters)
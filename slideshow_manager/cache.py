@@ -0,0 +1,240 @@
+"""Cache backends shared by the views.
+
+``SQLiteCache`` keeps entries in a local SQLite database in WAL mode, so
+all gunicorn workers on a host see the same device states, listings and
+previews instead of each polling the players on its own. ``MemoryCache``
+is the per-process fallback with the same interface. Keys are plain
+strings; values are JSON-serialisable objects or ``bytes``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Mapping, Optional, Tuple
+
+
+class Cache:
+    """Abstract base cache with per-entry TTL."""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> None:
+        raise NotImplementedError
+
+    def after_fork(self) -> None:
+        """Re-create process local resources in a forked worker."""
+
+
+class MemoryCache(Cache):
+    """Thread-safe in-process LRU cache.
+
+    ``max_bytes`` bounds the total size of ``bytes`` values (previews); the
+    least recently used entries are dropped first.
+    """
+
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 128 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.max_entries <= 0 or _size(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (time.time() + ttl, value)
+            self._bytes += _size(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._pop(key)
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= _size(entry[1])
+
+
+class SQLiteCache(Cache):
+    """Cache stored in a SQLite file that several processes can share.
+
+    Expired entries are purged first. If more than ``max_entries`` entries
+    or more than ``max_bytes`` of stored values remain, the entries that
+    expire soonest are deleted until both limits hold. This runs every
+    ``evict_every`` writes, or earlier once a tenth of ``max_bytes`` was
+    written since the last run. Values larger than ``max_bytes`` are not
+    cached at all. Database errors are treated as cache misses so a broken
+    cache file never fails a request.
+    """
+
+    def __init__(
+        self, path: str, max_entries: int = 5000, evict_every: int = 100, max_bytes: int = 128 * 1024 * 1024
+    ) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._written_bytes = 0
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, kind TEXT NOT NULL, value BLOB, expires REAL NOT NULL,"
+                " size INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(cache)")}
+            if "size" not in columns:
+                # Cache files written before the byte budget existed.
+                connection.execute("ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                connection.execute("UPDATE cache SET size = length(value)")
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def after_fork(self) -> None:
+        # Never reuse a SQLite connection inherited across fork().
+        self._local = threading.local()
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._connect().execute(
+                "SELECT kind, value FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        kind, value = row
+        return bytes(value) if kind == "bytes" else json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        if isinstance(value, (bytes, bytearray)):
+            kind, payload = "bytes", sqlite3.Binary(bytes(value))
+        else:
+            kind, payload = "json", json.dumps(value, ensure_ascii=False)
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        try:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, kind, value, expires, size) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, payload, time.time() + ttl, size),
+            )
+            self._writes += 1
+            self._written_bytes += size
+            if self._writes % self.evict_every == 0 or self._written_bytes * 10 > self.max_bytes:
+                self.evict()
+        except sqlite3.Error:
+            return
+
+    def delete(self, *keys: str) -> None:
+        try:
+            self._connect().executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+        except sqlite3.Error:
+            return
+
+    def delete_prefix(self, prefix: str) -> None:
+        try:
+            # Range scan on the primary key instead of LIKE, which would need escaping.
+            self._connect().execute(
+                "DELETE FROM cache WHERE key >= ? AND key < ?", (prefix, prefix + "\U0010ffff")
+            )
+        except sqlite3.Error:
+            return
+
+    def evict(self) -> None:
+        """Purge expired entries, then the soonest-expiring ones beyond the limits."""
+
+        self._written_bytes = 0
+        connection = self._connect()
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in connection.execute("SELECT key, size FROM cache ORDER BY expires"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count, total = count - 1, total - size
+        connection.executemany("DELETE FROM cache WHERE key = ?", doomed)
+
+
+def _size(value: Any) -> int:
+    return len(value) if isinstance(value, (bytes, bytearray)) else 0
+
+
+def device_key(device_id: str, *parts: str) -> str:
+    """Cache key scoped to a device, so all its entries share one prefix."""
+
+    return "|".join(("device", device_id, *parts))
+
+
+def forget_device_state(cache: Cache, device_id: str) -> None:
+    """Drop cached state after an action changed the device."""
+
+    cache.delete(device_key(device_id, "state"), device_key(device_id, "overview"))
+
+
+def create_cache(config: Mapping[str, Any]) -> Cache:
+    """Build the cache selected by ``CACHE_BACKEND``."""
+
+    backend = config.get("CACHE_BACKEND", "sqlite")
+    max_entries = int(config.get("CACHE_MAX_ENTRIES", 5000))
+    max_bytes = int(config.get("CACHE_MAX_BYTES", 128 * 1024 * 1024))
+    if backend == "memory":
+        return MemoryCache(max_entries, max_bytes)
+    if backend != "sqlite":
+        raise ValueError(f"Unsupported CACHE_BACKEND '{backend}'")
+    path = config.get("CACHE_PATH") or Path(config["STORAGE_PATH"]).with_name("cache.sqlite3")
+    return SQLiteCache(str(path), max_entries, max_bytes=max_bytes)
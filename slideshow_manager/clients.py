@@ -1,11 +1,16 @@
 """Client helpers that talk to remote slideshow devices."""
 from __future__ import annotations
 
+import base64
+import json
+import os
+import threading
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 from urllib.parse import urljoin, quote
 
-import requests
+if TYPE_CHECKING:  # pragma: no cover - imported lazily, see _http()
+    import requests
 
 
 class RemoteAPIError(RuntimeError):
@@ -22,47 +27,300 @@ class RemoteDevice:
     username: str
     password: str
 
+    def url(self, path: str) -> str:
+        base = self.base_url.rstrip("/") + "/"
+        return urljoin(base, path.lstrip("/"))
 
-class SlideshowClient:
-    """Minimal REST wrapper around the slideshow API."""
 
-    def __init__(self, device: RemoteDevice, timeout: int = 8) -> None:
-        self.device = device
-        self.timeout = timeout
+@dataclass
+class RemoteCall:
+    """A single API call against one device, independent of the transport."""
+
+    device: RemoteDevice
+    method: str
+    path: str
+    json: Any = None
+
+
+class RemoteResponse:
+    """Transport neutral response exposing the parts of ``requests.Response`` we use."""
+
+    def __init__(self, status_code: int, content: bytes, content_type: str = "") -> None:
+        self.status_code = status_code
+        self.content = content
+        self.content_type = content_type
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content or b"null")
+
+    @classmethod
+    def from_requests(cls, response: "requests.Response") -> "RemoteResponse":
+        return cls(response.status_code, response.content, response.headers.get("Content-Type", ""))
+
+
+BatchResult = Union[RemoteResponse, RemoteAPIError]
+
+
+def _http():
+    """Import ``requests`` on first use.
+
+    It is the heaviest dependency of this module and not needed to build the
+    app, so gunicorn workers and the CLI start faster without it.
+    """
+
+    import requests
+
+    return requests
+
+
+_pool = threading.local()
 
-    def _make_session(self) -> requests.Session:
-        session = requests.Session()
-        login_url = self._url("/login")
+
+def _pooled_session() -> "requests.Session":
+    """Keep-alive session per thread and process, recreated after a fork."""
+
+    session = getattr(_pool, "session", None)
+    if session is None or getattr(_pool, "pid", None) != os.getpid():
+        session = _http().Session()
+        _pool.session = session
+        _pool.pid = os.getpid()
+    return session
+
+
+def reset_sessions() -> None:
+    """Drop pooled connections, e.g. in a freshly forked worker."""
+
+    global _pool
+    _pool = threading.local()
+
+
+class Transport:
+    """Abstract base transport that delivers :class:`RemoteCall` objects to devices."""
+
+    def request(self, call: RemoteCall, timeout: float) -> RemoteResponse:
+        raise NotImplementedError
+
+    def request_many(self, calls: List[RemoteCall], timeout: float) -> List[BatchResult]:
+        results: List[BatchResult] = []
+        for call in calls:
+            try:
+                results.append(self.request(call, timeout))
+            except RemoteAPIError as exc:
+                results.append(exc)
+        return results
+
+
+def _login(device: RemoteDevice, timeout: float, follow_redirects: bool = True) -> "requests.Session":
+    requests = _http()
+    session = requests.Session()
+    try:
         response = session.post(
-            login_url,
-            data={"username": self.device.username, "password": self.device.password},
-            timeout=self.timeout,
+            device.url("/login"),
+            data={"username": device.username, "password": device.password},
+            timeout=timeout,
+            allow_redirects=follow_redirects,
         )
+    except requests.RequestException as exc:
+        raise RemoteAPIError(f"Gerät nicht erreichbar: {exc}") from exc
+    if response.status_code != 200:
+        raise RemoteAPIError(
+            f"Login fehlgeschlagen (HTTP {response.status_code})", response.status_code
+        )
+    if "session" not in response.cookies.get_dict():
+        raise RemoteAPIError("Login fehlgeschlagen: Kein Session-Cookie erhalten")
+    return session
+
+
+def _send(
+    session: "requests.Session", call: RemoteCall, timeout: float, follow_redirects: bool = True
+) -> RemoteResponse:
+    requests = _http()
+    kwargs: Dict[str, Any] = {}
+    if call.json is not None:
+        kwargs["json"] = call.json
+    try:
+        response = session.request(
+            call.method, call.device.url(call.path), timeout=timeout, allow_redirects=follow_redirects, **kwargs
+        )
+    except requests.RequestException as exc:
+        raise RemoteAPIError(f"Gerät nicht erreichbar: {exc}") from exc
+    return RemoteResponse.from_requests(response)
+
+
+class DirectTransport(Transport):
+    """Talks to every device itself, logging in once per call."""
+
+    def request(self, call: RemoteCall, timeout: float) -> RemoteResponse:
+        session = _login(call.device, timeout)
+        return _send(session, call, timeout)
+
+    def request_many(self, calls: List[RemoteCall], timeout: float) -> List[BatchResult]:
+        # Contact the devices concurrently so offline ones cost one timeout, not one each.
+        return execute_locally(calls, timeout)
+
+
+class GatewayTransport(Transport):
+    """Forwards calls to a site-local aggregation gateway in a single HTTP request.
+
+    The gateway (see :mod:`slideshow_manager.gateway`) performs the device
+    logins and API calls on the local network, so a batch touching many
+    players costs one round trip from the manager.
+    """
+
+    def __init__(self, gateway_url: str, token: str = "", deadline: Optional[float] = None) -> None:
+        self.gateway_url = gateway_url
+        self.token = token
+        self.deadline = deadline
+
+    def request(self, call: RemoteCall, timeout: float) -> RemoteResponse:
+        result = self.request_many([call], timeout)[0]
+        if isinstance(result, RemoteAPIError):
+            raise result
+        return result
+
+    def request_many(self, calls: List[RemoteCall], timeout: float) -> List[BatchResult]:
+        if not calls:
+            return []
+        # The gateway answers unfinished calls with a timeout error once the
+        # deadline has passed, so the request itself needs only one extra timeout.
+        deadline = self.deadline or timeout * 2
+        payload = {
+            "timeout": timeout,
+            "deadline": deadline,
+            "calls": [
+                {
+                    "base_url": call.device.base_url,
+                    "username": call.device.username,
+                    "password": call.device.password,
+                    "method": call.method,
+                    "path": call.path,
+                    "json": call.json,
+                }
+                for call in calls
+            ],
+        }
+        headers = {"X-Gateway-Token": self.token} if self.token else {}
+        url = RemoteDevice(self.gateway_url, "", "").url("/api/batch")
+        try:
+            response = _pooled_session().post(url, json=payload, headers=headers, timeout=deadline + timeout)
+        except _http().RequestException as exc:
+            raise RemoteAPIError(f"Gateway nicht erreichbar: {exc}") from exc
         if response.status_code != 200:
             raise RemoteAPIError(
-                f"Login fehlgeschlagen (HTTP {response.status_code})", response.status_code
+                f"Gateway-Fehler (HTTP {response.status_code})", response.status_code
             )
-        if "session" not in response.cookies.get_dict():
-            raise RemoteAPIError("Login fehlgeschlagen: Kein Session-Cookie erhalten")
-        return session
-
-    def _request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
-        session = self._make_session()
-        url = self._url(path)
-        response = session.request(method, url, timeout=self.timeout, **kwargs)
-        if response.status_code >= 400:
+        entries = response.json().get("results", [])
+        if len(entries) != len(calls):
+            raise RemoteAPIError("Gateway-Antwort unvollständig")
+        return [decode_batch_result(entry) for entry in entries]
+
+
+def encode_batch_result(result: BatchResult) -> Dict[str, Any]:
+    """Serialise a batch result for the gateway wire format."""
+
+    if isinstance(result, RemoteAPIError):
+        return {"error": str(result), "status_code": result.status_code}
+    return {
+        "status_code": result.status_code,
+        "content_type": result.content_type,
+        "content": base64.b64encode(result.content).decode("ascii"),
+    }
+
+
+def decode_batch_result(entry: Dict[str, Any]) -> BatchResult:
+    """Inverse of :func:`encode_batch_result`."""
+
+    if "error" in entry:
+        return RemoteAPIError(str(entry["error"]), entry.get("status_code"))
+    return RemoteResponse(
+        int(entry.get("status_code", 0)),
+        base64.b64decode(entry.get("content", "")),
+        str(entry.get("content_type", "")),
+    )
+
+
+def execute_locally(
+    calls: List[RemoteCall],
+    timeout: float,
+    max_workers: int = 16,
+    deadline: Optional[float] = None,
+    follow_redirects: bool = True,
+) -> List[BatchResult]:
+    """Run calls against the devices directly, one login per device.
+
+    Calls for the same device share a session and keep their order, while
+    different devices are contacted concurrently. This is what the gateway
+    runs on the site network. Calls not finished within ``deadline`` seconds
+    are answered with a timeout error so the rest of the batch still returns.
+    The gateway disables ``follow_redirects`` so a device cannot send it to
+    another host.
+    """
+
+    groups: Dict[tuple, List[int]] = {}
+    for index, call in enumerate(calls):
+        key = (call.device.base_url, call.device.username, call.device.password)
+        groups.setdefault(key, []).append(index)
+
+    results: List[Optional[BatchResult]] = [None] * len(calls)
+
+    def run_group(indexes: List[int]) -> None:
+        try:
+            session = _login(calls[indexes[0]].device, timeout, follow_redirects)
+        except RemoteAPIError as exc:
+            for index in indexes:
+                results[index] = exc
+            return
+        for index in indexes:
             try:
-                message = response.json().get("message", response.text)
-            except Exception:  # pragma: no cover - defensive path
-                message = response.text
-            raise RemoteAPIError(
-                f"API-Fehler ({response.status_code}): {message}", response.status_code
-            )
-        return response
+                results[index] = _send(session, calls[index], timeout, follow_redirects)
+            except RemoteAPIError as exc:
+                results[index] = exc
+
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    workers = max(1, min(max_workers, len(groups)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        wait([pool.submit(run_group, indexes) for indexes in groups.values()], timeout=deadline)
+    finally:
+        # Groups still running after the deadline are abandoned, queued ones cancelled.
+        pool.shutdown(wait=deadline is None, cancel_futures=True)
+    expired = RemoteAPIError("Zeitüberschreitung am Gateway", 504)
+    return [result if result is not None else expired for result in list(results)]
+
+
+def _raise_for_status(response: RemoteResponse) -> RemoteResponse:
+    if response.status_code >= 400:
+        try:
+            message = response.json().get("message", response.text)
+        except Exception:  # pragma: no cover - defensive path
+            message = response.text
+        raise RemoteAPIError(
+            f"API-Fehler ({response.status_code}): {message}", response.status_code
+        )
+    return response
+
+
+class SlideshowClient:
+    """Minimal REST wrapper around the slideshow API."""
+
+    def __init__(
+        self, device: RemoteDevice, timeout: int = 8, transport: Optional[Transport] = None
+    ) -> None:
+        self.device = device
+        self.timeout = timeout
+        self.transport = transport or DirectTransport()
+
+    def _request(self, method: str, path: str, json: Any = None) -> RemoteResponse:
+        response = self.transport.request(RemoteCall(self.device, method, path, json), self.timeout)
+        return _raise_for_status(response)
 
     def _url(self, path: str) -> str:
-        base = self.device.base_url.rstrip("/") + "/"
-        return urljoin(base, path.lstrip("/"))
+        return self.device.url(path)
 
     def get_state(self) -> Dict[str, Any]:
         response = self._request("GET", "/api/state")
@@ -100,7 +358,71 @@ class SlideshowClient:
         response = self._request("POST", "/api/player/info-screen", json={"enabled": enabled})
         return response.json()
 
+    def get_overview(self) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """Fetch state, config and sources in one transport batch."""
+
+        calls = [RemoteCall(self.device, "GET", path) for path in ("/api/state", "/api/config", "/api/sources")]
+        payloads = []
+        for result in self.transport.request_many(calls, self.timeout):
+            if isinstance(result, RemoteAPIError):
+                raise result
+            payloads.append(_raise_for_status(result).json())
+        state, config, sources = payloads
+        return state, config, sources
+
+    def list_media(self, source: str, path: str = "") -> Dict[str, Any]:
+        query = f"?path={quote(path)}" if path else ""
+        response = self._request("GET", f"/api/sources/{quote(source)}/browse{query}")
+        return response.json()
+
     def fetch_preview(self, source: str, media_path: str) -> bytes:
         path = f"/media/preview/{quote(source)}/{quote(media_path)}"
         response = self._request("GET", path)
         return response.content
+
+
+def build_transport(config: Mapping[str, Any]) -> Transport:
+    """Create the transport selected by the ``REMOTE_TRANSPORT`` setting."""
+
+    mode = config.get("REMOTE_TRANSPORT", "direct")
+    if mode == "gateway":
+        return GatewayTransport(
+            config.get("GATEWAY_URL", ""),
+            config.get("GATEWAY_TOKEN", ""),
+            float(config.get("GATEWAY_DEADLINE") or 0) or None,
+        )
+    if mode != "direct":
+        raise RemoteAPIError(f"Unbekannter REMOTE_TRANSPORT '{mode}'")
+    return DirectTransport()
+
+
+def send_batch(calls: List[RemoteCall], transport: Transport, timeout: float) -> List[BatchResult]:
+    """Send ``calls`` as one transport batch; HTTP error statuses become :class:`RemoteAPIError`."""
+
+    results: List[BatchResult] = []
+    for result in transport.request_many(calls, timeout):
+        if isinstance(result, RemoteResponse):
+            try:
+                result = _raise_for_status(result)
+            except RemoteAPIError as exc:
+                result = exc
+        results.append(result)
+    return results
+
+
+def fetch_states(
+    devices: Iterable[RemoteDevice], transport: Transport, timeout: float
+) -> List[Union[Dict[str, Any], RemoteAPIError]]:
+    """Query ``/api/state`` for many devices through a single transport batch."""
+
+    calls = [RemoteCall(device, "GET", "/api/state") for device in devices]
+    states: List[Union[Dict[str, Any], RemoteAPIError]] = []
+    for result in send_batch(calls, transport, timeout):
+        if isinstance(result, RemoteAPIError):
+            states.append(result)
+            continue
+        try:
+            states.append(result.json())
+        except ValueError:
+            states.append(RemoteAPIError("Ungültige Antwort vom Gerät"))
+    return states
@@ -0,0 +1,311 @@
+"""Network discovery of slideshow players.
+
+Configured CIDR ranges and host lists are expanded into candidate
+addresses which are probed concurrently through a bounded thread pool. A
+cheap TCP connect with a tight timeout filters out empty addresses before
+``/login`` and ``/api/state`` are requested, so scanning a /22 takes a few
+seconds instead of minutes.
+
+Scans run in a background thread so a large range cannot exceed the
+gunicorn worker timeout. Progress and results are kept in the shared cache,
+so the result page works no matter which worker serves it.
+"""
+from __future__ import annotations
+
+import ipaddress
+import socket
+import threading
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import Blueprint, Flask, Response, current_app, flash, redirect, render_template, request, url_for
+
+from .audit import audit
+from .auth import login_required
+from .clients import _http
+
+
+bp = Blueprint("discovery", __name__)
+
+# Status codes of /api/state that indicate the slideshow API behind a login.
+_PROTECTED_STATUS = {200, 302, 303, 401, 403}
+
+# How long scan results stay available on the result page.
+_SCAN_TTL = 3600
+
+_lookup_pool: Optional[Any] = None
+_lookup_pool_lock = threading.Lock()
+
+
+class DiscoveryError(ValueError):
+    """Raised for invalid scan targets."""
+
+
+@dataclass
+class DiscoveredPlayer:
+    host: str
+    port: int
+    base_url: str
+    hostname: str = ""
+    version: str = ""
+
+    @property
+    def suggested_name(self) -> str:
+        return self.hostname.split(".")[0] if self.hostname else f"Player {self.host}"
+
+
+def expand_targets(lines: Iterable[str], max_hosts: int = 4096) -> List[str]:
+    """Expand CIDR ranges, single addresses and host names into a host list."""
+
+    hosts: List[str] = []
+    seen = set()
+    for raw in lines:
+        for entry in raw.replace(",", " ").split():
+            try:
+                if "/" in entry:
+                    network = ipaddress.ip_network(entry, strict=False)
+                    if network.num_addresses > max_hosts + 2:
+                        raise DiscoveryError(f"Bereich {entry} ist zu groß (maximal {max_hosts} Hosts)")
+                    candidates = [str(address) for address in network.hosts()] or [str(network.network_address)]
+                else:
+                    candidates = [entry]
+            except ValueError as exc:
+                if isinstance(exc, DiscoveryError):
+                    raise
+                raise DiscoveryError(f"Ungültiger Bereich '{entry}'") from exc
+            for host in candidates:
+                if host not in seen:
+                    seen.add(host)
+                    hosts.append(host)
+            if len(hosts) > max_hosts:
+                raise DiscoveryError(f"Zu viele Hosts (maximal {max_hosts})")
+    return hosts
+
+
+def _port_open(host: str, port: int, timeout: float) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def probe(host: str, port: int, scheme: str, timeout: float) -> Optional[DiscoveredPlayer]:
+    """Return a :class:`DiscoveredPlayer` if ``host`` runs the slideshow API."""
+
+    if not _port_open(host, port, timeout):
+        return None
+    default_port = 443 if scheme == "https" else 80
+    authority = f"[{host}]" if ":" in host else host
+    base_url = f"{scheme}://{authority}" + ("" if port == default_port else f":{port}")
+    requests = _http()
+    try:
+        login = requests.get(f"{base_url}/login", timeout=timeout, allow_redirects=False)
+        if login.status_code != 200:
+            return None
+        state = requests.get(f"{base_url}/api/state", timeout=timeout, allow_redirects=False)
+    except requests.RequestException:
+        return None
+    if state.status_code not in _PROTECTED_STATUS:
+        return None
+
+    version = ""
+    if state.status_code == 200:
+        try:
+            payload = state.json()
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        version = str(payload.get("version", ""))
+    hostname = _reverse_lookup(host, timeout)
+    return DiscoveredPlayer(host=host, port=port, base_url=base_url, hostname=hostname, version=version)
+
+
+def _reverse_lookup(host: str, timeout: float = 1.0) -> str:
+    """PTR lookup bounded by ``timeout``; ``gethostbyaddr`` itself has none."""
+
+    global _lookup_pool
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return host
+    from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+    with _lookup_pool_lock:
+        if _lookup_pool is None:
+            _lookup_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="slideshow-lookup")
+    future = _lookup_pool.submit(socket.gethostbyaddr, host)
+    try:
+        return future.result(timeout=max(timeout, 1.0))[0]
+    except (OSError, TimeoutError):
+        future.cancel()
+        return ""
+
+
+def scan(
+    hosts: List[str],
+    ports: Iterable[int] = (80,),
+    scheme: str = "http",
+    timeout: float = 0.5,
+    max_workers: int = 128,
+    max_probes: int = 4096,
+) -> List[DiscoveredPlayer]:
+    """Probe every host/port combination concurrently."""
+
+    jobs: List[Tuple[str, int]] = [(host, port) for host in hosts for port in ports]
+    if len(jobs) > max_probes:
+        raise DiscoveryError(f"Zu viele Prüfungen ({len(jobs)} Host/Port-Kombinationen, maximal {max_probes})")
+    if not jobs:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = max(1, min(max_workers, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        found = pool.map(lambda job: probe(job[0], job[1], scheme, timeout), jobs)
+        return [player for player in found if player is not None]
+
+
+def _parse_ports(value: str) -> List[int]:
+    ports = []
+    for part in value.replace(",", " ").split():
+        if not part.isdigit() or not 0 < int(part) < 65536:
+            raise DiscoveryError(f"Ungültiger Port '{part}'")
+        ports.append(int(part))
+    return ports or [80]
+
+
+def _scan_key(scan_id: str) -> str:
+    return f"discovery|{scan_id}"
+
+
+def _scan_slots(app: Flask) -> threading.BoundedSemaphore:
+    slots = app.extensions.get("discovery_slots")
+    if slots is None:
+        slots = app.extensions.setdefault(
+            "discovery_slots", threading.BoundedSemaphore(int(app.config.get("DISCOVERY_MAX_SCANS", 1)))
+        )
+    return slots
+
+
+def start_scan(app: Flask, form: Dict[str, Any]) -> str:
+    """Validate ``form``, start the scan in a background thread and return its id.
+
+    At most ``DISCOVERY_MAX_SCANS`` scans run per process; further requests
+    are rejected until one has finished.
+    """
+
+    config = app.config
+    hosts = expand_targets(form["targets"].splitlines(), int(config.get("DISCOVERY_MAX_HOSTS", 4096)))
+    ports = _parse_ports(form["ports"])
+    max_probes = int(config.get("DISCOVERY_MAX_PROBES", 4096))
+    probes = len(hosts) * len(ports)
+    if probes > max_probes:
+        raise DiscoveryError(f"Zu viele Prüfungen ({probes} Host/Port-Kombinationen, maximal {max_probes})")
+    slots = _scan_slots(app)
+    if not slots.acquire(blocking=False):
+        raise DiscoveryError("Es läuft bereits eine Suche. Bitte warten, bis sie abgeschlossen ist.")
+
+    cache = app.cache  # type: ignore[attr-defined]
+    scan_id = uuid.uuid4().hex
+    record: Dict[str, Any] = {"state": "running", "form": form, "hosts": len(hosts), "players": [], "error": ""}
+
+    def run() -> None:
+        try:
+            players = scan(
+                hosts,
+                ports,
+                form["scheme"],
+                float(config.get("DISCOVERY_TIMEOUT", 0.5)),
+                int(config.get("DISCOVERY_WORKERS", 128)),
+                max_probes,
+            )
+        except Exception as exc:  # noqa: BLE001 - reported on the result page
+            app.logger.exception("Gerätesuche fehlgeschlagen")
+            record.update(state="failed", error=str(exc))
+        else:
+            record.update(state="done", players=[asdict(player) for player in players])
+        finally:
+            slots.release()
+        cache.set(_scan_key(scan_id), record, _SCAN_TTL)
+
+    cache.set(_scan_key(scan_id), record, _SCAN_TTL)
+    try:
+        threading.Thread(target=run, name="slideshow-discovery", daemon=True).start()
+    except RuntimeError:
+        slots.release()
+        raise
+    return scan_id
+
+
+@bp.route("/devices/discover", methods=["GET", "POST"])
+@login_required
+def discover() -> Response:
+    form: Dict[str, Any] = {"targets": "", "ports": "80", "scheme": "http"}
+    if request.method == "POST":
+        form = {
+            "targets": request.form.get("targets", ""),
+            "ports": request.form.get("ports", "80"),
+            "scheme": "https" if request.form.get("scheme") == "https" else "http",
+        }
+        try:
+            scan_id = start_scan(current_app._get_current_object(), form)  # type: ignore[attr-defined]
+        except DiscoveryError as exc:
+            flash(str(exc), "danger")
+        else:
+            return redirect(url_for("discovery.discover_result", scan_id=scan_id))
+    return render_template("devices/discover.html", players=None, form=form, known=set(), running=False)
+
+
+@bp.route("/devices/discover/<scan_id>")
+@login_required
+def discover_result(scan_id: str) -> Response:
+    record = current_app.cache.get(_scan_key(scan_id))  # type: ignore[attr-defined]
+    if record is None:
+        flash("Suchergebnis nicht gefunden oder abgelaufen.", "warning")
+        return redirect(url_for("discovery.discover"))
+
+    players: Optional[List[DiscoveredPlayer]] = None
+    running = record["state"] == "running"
+    if record["state"] == "failed":
+        flash(f"Suche fehlgeschlagen: {record['error']}", "danger")
+    elif not running:
+        players = [DiscoveredPlayer(**player) for player in record["players"]]
+        flash(f"{record['hosts']} Adressen geprüft, {len(players)} Player gefunden.", "info")
+    known = {device.base_url.rstrip("/") for device in current_app.storage.list_devices()}  # type: ignore[attr-defined]
+    return render_template(
+        "devices/discover.html", players=players, form=record["form"], known=known, running=running, hosts=record["hosts"]
+    )
+
+
+@bp.route("/devices/discover/import", methods=["POST"])
+@login_required
+def discover_import() -> Response:
+    storage = current_app.storage  # type: ignore[attr-defined]
+    username = request.form.get("username", "").strip()
+    if not username:
+        flash("Benutzername ist für den Import erforderlich.", "danger")
+        return redirect(url_for("discovery.discover"))
+
+    known = {device.base_url.rstrip("/") for device in storage.list_devices()}
+    tags = [tag.strip() for tag in request.form.get("tags", "").split(",") if tag.strip()]
+    items = []
+    for base_url in request.form.getlist("base_url"):
+        if base_url.rstrip("/") in known:
+            continue
+        known.add(base_url.rstrip("/"))
+        items.append(
+            {
+                "name": request.form.get(f"name::{base_url}") or base_url,
+                "base_url": base_url,
+                "username": username,
+                "password": request.form.get("password", ""),
+                "tags": tags,
+            }
+        )
+    added = storage.add_many(items)
+    for device in added:
+        audit("device.discover_import", device_id=device.id, payload={"base_url": device.base_url, "name": device.name})
+    flash(f"{len(added)} Geräte importiert.", "success")
+    return redirect(url_for("dashboard.devices"))
@@ -0,0 +1,196 @@
+"""Site-local aggregation gateway for batched device calls.
+
+The gateway runs next to the players of a remote site and accepts a batch
+of API calls in one HTTP request (``POST /api/batch``). It logs in to every
+device once, executes the calls on the local network and returns all
+results together, so the manager pays a single WAN round trip per batch.
+
+The gateway refuses to start without ``GATEWAY_TOKEN`` and only forwards
+calls to the networks and hosts listed in ``GATEWAY_ALLOWED_TARGETS``, so it
+cannot be used as an open proxy into the site network. In production run it
+under gunicorn::
+
+    gunicorn -w 2 -b 0.0.0.0:5050 'slideshow_manager.gateway:create_gateway_app()'
+"""
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import math
+import os
+import posixpath
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
+
+from .clients import BatchResult, RemoteAPIError, RemoteCall, RemoteDevice, encode_batch_result, execute_locally
+
+
+bp = Blueprint("gateway", __name__)
+
+_ALLOWED_METHODS = {"GET", "POST", "PUT", "DELETE"}
+# Only the slideshow API is forwarded, never arbitrary paths.
+_ALLOWED_PATHS = {"/login"}
+_ALLOWED_PATH_PREFIXES = ("/api/", "/media/")
+
+Target = Union[ipaddress.IPv4Network, ipaddress.IPv6Network, str]
+
+
+class GatewayConfigError(RuntimeError):
+    """Raised when the gateway is started without a token or target list."""
+
+
+class BatchError(ValueError):
+    """Raised for a malformed batch request body."""
+
+
+def parse_targets(value: Union[str, Iterable[str]]) -> List[Target]:
+    """Parse CIDR networks, addresses and host names (``.example.org`` for a domain)."""
+
+    entries = value.replace(",", " ").split() if isinstance(value, str) else list(value)
+    targets: List[Target] = []
+    for entry in entries:
+        try:
+            targets.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            targets.append(entry.lower())
+    return targets
+
+
+def target_allowed(base_url: str, targets: List[Target]) -> bool:
+    parts = urlsplit(base_url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in {"http", "https"} or not host:
+        return False
+    try:
+        address: Optional[Any] = ipaddress.ip_address(host)
+    except ValueError:
+        address = None
+    for target in targets:
+        if isinstance(target, str):
+            if address is None and (host == target or (target.startswith(".") and host.endswith(target))):
+                return True
+        elif address is not None and address in target:
+            return True
+    return False
+
+
+def path_allowed(path: str) -> bool:
+    """Check the path part of ``path`` against the slideshow API after normalisation.
+
+    Dot segments, also percent-encoded ones, and backslashes are refused
+    outright, because the device URL is built with ``urljoin``, which would
+    resolve them to a path outside the API.
+    """
+
+    route = path.split("?", 1)[0].split("#", 1)[0]
+    lowered = route.lower()
+    if not route.startswith("/") or route.startswith("//") or "\\" in route:
+        return False
+    if "%2e" in lowered or "%2f" in lowered or "%5c" in lowered:
+        return False
+    if any(segment in {".", ".."} for segment in route.split("/")):
+        return False
+    normalised = posixpath.normpath(route)
+    return normalised in _ALLOWED_PATHS or normalised.startswith(_ALLOWED_PATH_PREFIXES)
+
+
+def _check_call(call: RemoteCall, targets: List[Target]) -> Optional[RemoteAPIError]:
+    if not target_allowed(call.device.base_url, targets):
+        return RemoteAPIError(f"Ziel {call.device.base_url} ist am Gateway nicht freigegeben", 403)
+    if call.method not in _ALLOWED_METHODS or not path_allowed(call.path):
+        return RemoteAPIError(f"Aufruf {call.method} {call.path} ist am Gateway nicht erlaubt", 403)
+    return None
+
+
+def _parse_calls(payload: Dict[str, Any]) -> List[RemoteCall]:
+    entries = payload.get("calls", [])
+    if not isinstance(entries, list):
+        raise BatchError("'calls' muss eine Liste sein")
+    calls: List[RemoteCall] = []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise BatchError(f"Aufruf {number} muss ein Objekt sein")
+        device = RemoteDevice(
+            str(entry.get("base_url", "")),
+            str(entry.get("username", "")),
+            str(entry.get("password", "")),
+        )
+        calls.append(
+            RemoteCall(device, str(entry.get("method", "GET")).upper(), str(entry.get("path", "/")), entry.get("json"))
+        )
+    return calls
+
+
+def _seconds(payload: Dict[str, Any], key: str, default: float) -> float:
+    value = payload.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        raise BatchError(f"'{key}' muss eine positive Zahl sein")
+    return float(value)
+
+
+@bp.route("/api/batch", methods=["POST"])
+def batch() -> Response:
+    token = current_app.config.get("GATEWAY_TOKEN", "")
+    if not token or not hmac.compare_digest(request.headers.get("X-Gateway-Token", ""), token):
+        return jsonify({"message": "Ungültiges Gateway-Token"}), 403  # type: ignore[return-value]
+
+    payload = request.get_json(silent=True)
+    try:
+        if not isinstance(payload, dict):
+            raise BatchError("Erwartet wird ein JSON-Objekt")
+        calls = _parse_calls(payload)
+        timeout = min(_seconds(payload, "timeout", 8), float(current_app.config.get("REMOTE_TIMEOUT", 8)))
+        deadline = min(
+            _seconds(payload, "deadline", timeout * 2), float(current_app.config.get("GATEWAY_MAX_DEADLINE", 60))
+        )
+    except BatchError as exc:
+        return jsonify({"message": f"Ungültiger Batch: {exc}"}), 400  # type: ignore[return-value]
+    max_calls = int(current_app.config.get("GATEWAY_MAX_CALLS", 500))
+    if len(calls) > max_calls:
+        return jsonify({"message": f"Maximal {max_calls} Aufrufe pro Batch"}), 413  # type: ignore[return-value]
+
+    targets = current_app.config["GATEWAY_TARGETS"]
+    results: List[Optional[BatchResult]] = [_check_call(call, targets) for call in calls]
+    allowed: List[Tuple[int, RemoteCall]] = [
+        (index, call) for index, call in enumerate(calls) if results[index] is None
+    ]
+    executed = execute_locally(
+        [call for _, call in allowed],
+        timeout,
+        int(current_app.config.get("GATEWAY_WORKERS", 16)),
+        deadline,
+        follow_redirects=False,
+    )
+    for (index, _), result in zip(allowed, executed):
+        results[index] = result
+    return jsonify({"results": [encode_batch_result(result) for result in results if result is not None]})
+
+
+def create_gateway_app(config: dict | None = None) -> Flask:
+    app = Flask(__name__)
+    app.config.from_mapping(
+        GATEWAY_TOKEN=os.environ.get("GATEWAY_TOKEN", ""),
+        GATEWAY_ALLOWED_TARGETS=os.environ.get("GATEWAY_ALLOWED_TARGETS", ""),
+        GATEWAY_WORKERS=16,
+        GATEWAY_MAX_CALLS=500,
+        GATEWAY_MAX_DEADLINE=60,
+        REMOTE_TIMEOUT=8,
+    )
+    if config:
+        app.config.update(config)
+    if not app.config["GATEWAY_TOKEN"]:
+        raise GatewayConfigError("GATEWAY_TOKEN muss gesetzt sein")
+    app.config["GATEWAY_TARGETS"] = parse_targets(app.config["GATEWAY_ALLOWED_TARGETS"])
+    if not app.config["GATEWAY_TARGETS"]:
+        raise GatewayConfigError("GATEWAY_ALLOWED_TARGETS muss die Netze oder Hosts der Player enthalten")
+    app.register_blueprint(bp)
+    return app
+
+
+if __name__ == "__main__":
+    # Development server only; use gunicorn in production (see module docstring).
+    create_gateway_app().run(
+        host=os.environ.get("GATEWAY_HOST", "127.0.0.1"), port=int(os.environ.get("GATEWAY_PORT", "5050"))
+    )
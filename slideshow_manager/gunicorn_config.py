@@ -0,0 +1,13 @@
+"""Gunicorn hooks, loaded via ``--config python:slideshow_manager.gunicorn_config``."""
+from __future__ import annotations
+
+from typing import Any
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    # Without --preload every worker builds its own app after this hook.
+    if not server.cfg.preload_app:
+        return
+    from . import init_worker
+
+    init_worker(server.app.wsgi())
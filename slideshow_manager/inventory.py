@@ -0,0 +1,205 @@
+"""Bulk import and export of the device inventory as CSV or JSON Lines.
+
+Exports are produced row by row so the HTTP response and the CLI can
+stream them. Imports read and validate the input row by row and hand all
+valid rows to :meth:`DeviceStorage.upsert_many`, which rewrites the
+inventory file once instead of once per device; the valid rows of one import
+are therefore held in memory until that single write. Every changed
+device still gets its own audit entry, from the web import and the CLI.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Blueprint, Response, current_app, flash, redirect, render_template, request, stream_with_context, url_for
+
+from .audit import audit, diff_dicts
+from .auth import login_required
+from .storage import Device, DeviceStorage
+
+
+bp = Blueprint("inventory", __name__)
+
+FIELDS = ["id", "name", "base_url", "username", "password", "notes", "tags"]
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+class InventoryError(ValueError):
+    """Raised for invalid inventory rows or formats."""
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    changes: List[Tuple[Optional[Dict[str, object]], Dict[str, object]]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def record_changes(self, record: Callable[..., None], **fields: Any) -> None:
+        """Pass one ``device.import`` audit entry per changed device to ``record``."""
+
+        for before, after in self.changes:
+            diff = diff_dicts(before, after)
+            if diff:
+                record("device.import", device_id=str(after["id"]), diff=diff, **fields)
+
+
+def detect_format(filename: str, explicit: Optional[str] = None) -> str:
+    if explicit:
+        if explicit not in FORMATS:
+            raise InventoryError(f"Unbekanntes Format '{explicit}'")
+        return explicit
+    lowered = filename.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise InventoryError("Format nicht erkennbar – bitte csv oder jsonl angeben")
+
+
+def export_rows(devices: Iterable[Device], fmt: str, include_passwords: bool = True) -> Iterator[str]:
+    """Yield the serialised inventory one line at a time."""
+
+    fields = FIELDS if include_passwords else [name for name in FIELDS if name != "password"]
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for device in devices:
+            row = device.to_dict()
+            row["tags"] = ", ".join(device.tags)
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Header only for an empty inventory.
+        if buffer.getvalue():
+            yield buffer.getvalue()
+    elif fmt == "jsonl":
+        for device in devices:
+            row = device.to_dict()
+            yield json.dumps({name: row[name] for name in fields}, ensure_ascii=False) + "\n"
+    else:
+        raise InventoryError(f"Unbekanntes Format '{fmt}'")
+
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(row_number, record)`` pairs; unparsable rows yield an exception."""
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                yield number, InventoryError(f"Ungültiges JSON: {exc}")
+    else:
+        raise InventoryError(f"Unbekanntes Format '{fmt}'")
+
+
+def validate_record(record: Any) -> Dict[str, object]:
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise InventoryError("Zeile ist kein Objekt")
+    data = {name: record.get(name) for name in FIELDS if record.get(name) not in (None, "")}
+    for name in ("name", "base_url", "username"):
+        if not str(data.get(name, "")).strip():
+            raise InventoryError(f"Pflichtfeld '{name}' fehlt")
+    base_url = str(data["base_url"]).strip()
+    if not base_url.startswith(("http://", "https://")):
+        raise InventoryError(f"Ungültige Basis-URL '{base_url}'")
+    data["base_url"] = base_url
+    tags = data.get("tags", [])
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    if not isinstance(tags, list):
+        raise InventoryError("Tags müssen eine Liste oder Komma-getrennt sein")
+    data["tags"] = [str(tag).strip() for tag in tags if str(tag).strip()]
+    return data
+
+
+def import_devices(storage: DeviceStorage, stream: IO[str], fmt: str) -> ImportReport:
+    """Validate ``stream`` row by row and upsert all valid rows in one write.
+
+    The valid rows are collected in memory until that write; invalid rows
+    only leave their error message in the report.
+    """
+
+    report = ImportReport()
+    valid: List[Dict[str, object]] = []
+    try:
+        for number, record in iter_records(stream, fmt):
+            try:
+                valid.append(validate_record(record))
+            except InventoryError as exc:
+                report.errors.append((number, str(exc)))
+    except (csv.Error, UnicodeDecodeError) as exc:
+        report.errors.append((0, f"Datei nicht lesbar: {exc}"))
+        return report
+
+    report.changes = storage.upsert_many(valid)
+    report.created = sum(1 for before, _ in report.changes if before is None)
+    report.updated = len(report.changes) - report.created
+    return report
+
+
+@bp.route("/devices/export")
+@login_required
+def export() -> Response:
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        flash("Unbekanntes Exportformat.", "danger")
+        return redirect(url_for("dashboard.devices"))
+    storage = current_app.storage  # type: ignore[attr-defined]
+    include_passwords = request.args.get("passwords", "1") != "0"
+    rows = export_rows(storage.iter_devices(), fmt, include_passwords)
+    return Response(
+        stream_with_context(rows),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=devices.{fmt}"},
+    )
+
+
+@bp.route("/devices/import", methods=["GET", "POST"])
+@login_required
+def import_view() -> Response:
+    report: Optional[ImportReport] = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Bitte eine Datei auswählen.", "danger")
+        else:
+            try:
+                fmt = detect_format(upload.filename, request.form.get("format") or None)
+                stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+                report = import_devices(current_app.storage, stream, fmt)  # type: ignore[attr-defined]
+            except InventoryError as exc:
+                flash(str(exc), "danger")
+            else:
+                report.record_changes(audit, payload={"file": upload.filename})
+                audit(
+                    "inventory.import",
+                    payload={"file": upload.filename, "format": fmt},
+                    result="ok" if report.ok else "error",
+                    message=f"{report.created} angelegt, {report.updated} aktualisiert, {len(report.errors)} Fehler",
+                )
+                category = "success" if report.ok else "warning"
+                flash(
+                    f"{report.created} Geräte angelegt, {report.updated} aktualisiert, {len(report.errors)} Fehler.",
+                    category,
+                )
+    return render_template("devices/import.html", report=report)
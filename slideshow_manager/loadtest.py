@@ -0,0 +1,591 @@
+"""Load and soak tests for ``python -m slideshow_manager loadtest``.
+
+A farm of simulated players is served by one local HTTP server, each player
+under its own path prefix (``/player/<n>/``). Virtual operators run a
+scripted session against the manager – login, dashboard, device detail,
+preview and a bulk action – while concurrency is ramped stage by stage.
+The report lists throughput, tail latency and error rate per stage and per
+time interval together with the resident memory of the manager processes.
+Unless ``--url`` points at a running instance, the manager is started under
+gunicorn in a separate process, so the harness does not distort the numbers.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .clients import _http
+
+SESSION_STEPS = ("login", "dashboard", "detail", "preview", "bulk_action")
+
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+_PREVIEW_IMAGE = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89"
+    b"\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+class _PlayerHandler(BaseHTTPRequestHandler):
+    """Answers the slideshow REST API for every player of the farm."""
+
+    server: "_FarmServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - signature of the base class
+        return
+
+    def _handle(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        parts = self.path.split("?", 1)[0].strip("/").split("/", 2)
+        if len(parts) < 3 or parts[0] != "player":
+            self._reply(404, {"error": "unknown player"})
+            return
+        player, endpoint = parts[1], "/" + parts[2]
+        farm = self.server
+        if farm.latency:
+            time.sleep(random.uniform(0.5, 1.5) * farm.latency)
+        if farm.error_rate and random.random() < farm.error_rate:
+            self._reply(500, {"error": "simulierter Fehler"})
+            return
+
+        if endpoint == "/login":
+            self._reply(200, {"status": "ok"}, {"Set-Cookie": "session=loadtest; Path=/"})
+        elif endpoint == "/api/state":
+            self._reply(
+                200,
+                {
+                    "service_status": "active",
+                    "service_active": True,
+                    "primary_media_type": "image",
+                    "primary_media_path": "bild.jpg",
+                    "primary_source": "local",
+                    "version": "loadtest",
+                    "player": player,
+                },
+            )
+        elif endpoint == "/api/config":
+            self._reply(200, {"playback": {"image_duration": 10, "image_fit": "contain", "transition_type": "fade"}})
+        elif endpoint == "/api/sources":
+            self._reply(200, {"sources": [{"name": "local", "type": "local"}]})
+        elif endpoint.startswith("/api/sources/") and endpoint.endswith("/browse"):
+            self._reply(200, {"entries": [{"name": f"bild{index}.jpg", "type": "image"} for index in range(50)]})
+        elif endpoint.startswith("/media/preview/"):
+            self._reply(200, _PREVIEW_IMAGE, {"Content-Type": "image/png"})
+        elif endpoint.startswith(("/api/player/", "/api/playback")):
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def _reply(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        content = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class _FarmServer(ThreadingHTTPServer):
+    daemon_threads = True
+    latency = 0.0
+    error_rate = 0.0
+
+
+class PlayerFarm:
+    """``count`` simulated players behind one threaded HTTP server."""
+
+    def __init__(self, count: int, latency: float = 0.02, error_rate: float = 0.0, host: str = "127.0.0.1") -> None:
+        self.count = count
+        self._server = _FarmServer((host, 0), _PlayerHandler)
+        self._server.latency = latency
+        self._server.error_rate = error_rate
+        self._thread = threading.Thread(target=self._server.serve_forever, name="loadtest-farm", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def player_urls(self) -> List[str]:
+        return [f"{self.base_url}/player/{index}" for index in range(self.count)]
+
+    def start(self) -> "PlayerFarm":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class LocalManager:
+    """The manager under gunicorn in its own process, with a throwaway data directory.
+
+    It is started like ``scripts/start-service.sh`` does (same worker count,
+    hooks and preload switch), so the load generator does not share a process
+    or GIL with it and the memory figures are those of the gunicorn processes.
+    """
+
+    def __init__(self, user: str, password: str, workers: int = 3, preload: bool = False) -> None:
+        self.workers = workers
+        self.preload = preload
+        self._directory = tempfile.TemporaryDirectory(prefix="slideshow-loadtest-")
+        self.storage_path = str(Path(self._directory.name) / "devices.json")
+        self._config = {
+            "SECRET_KEY": "loadtest",
+            "STORAGE_PATH": self.storage_path,
+            # Derived from STORAGE_PATH, so paths from the environment are not used.
+            "SCHEDULE_PATH": "",
+            "AUDIT_PATH": "",
+            "AUTH_MODE": "static",
+            "TEST_USERS": {user: password},
+        }
+        self.port = 0
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 30.0) -> "LocalManager":
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        command = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--bind",
+            f"127.0.0.1:{self.port}",
+            "--workers",
+            str(self.workers),
+            "--log-level",
+            "warning",
+            "--config",
+            "python:slideshow_manager.gunicorn_config",
+        ]
+        env = dict(os.environ)
+        if self.preload:
+            command.append("--preload")
+            env["PRELOAD_APP"] = "1"
+        command.append(f"slideshow_manager:create_app({self._config!r})")
+        self._process = subprocess.Popen(command, cwd=_PROJECT_ROOT, env=env)
+        try:
+            self._wait_until_ready(timeout)
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def _wait_until_ready(self, timeout: float) -> None:
+        requests = _http()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process is None or self._process.poll() is not None:
+                raise RuntimeError("Gunicorn für den Loadtest-Manager wurde beendet")
+            try:
+                ready = requests.get(f"{self.url}/login", timeout=1).ok
+            except requests.RequestException:
+                ready = False
+            if ready and len(self.pids()) > self.workers:
+                return
+            time.sleep(0.1)
+        raise RuntimeError(f"Loadtest-Manager nach {timeout:.0f} s nicht erreichbar")
+
+    def pids(self) -> List[int]:
+        """The gunicorn master and its workers."""
+
+        if self._process is None:
+            return []
+        return [self._process.pid, *child_pids(self._process.pid)]
+
+    def stop(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            # SIGTERM lets gunicorn stop its workers, which flush their audit logs.
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        self._directory.cleanup()
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of ``pid`` from ``/proc`` (empty where unavailable)."""
+
+    children = []
+    for entry in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # The command name may contain spaces; the parent pid follows its ')'.
+            fields = entry.read_text(encoding="ascii", errors="replace").rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if fields and len(fields) > 1 and fields[1] == str(pid):
+            children.append(int(entry.parent.name))
+    return sorted(children)
+
+
+@dataclass
+class Sample:
+    started: float
+    step: str
+    latency: float
+    ok: bool
+
+
+@dataclass
+class Stats:
+    """Throughput, latency percentiles (ms) and error rate of a set of samples."""
+
+    label: str
+    requests: int = 0
+    errors: int = 0
+    throughput: float = 0.0
+    p50: float = 0.0
+    p95: float = 0.0
+    p99: float = 0.0
+    rss_kb: Optional[int] = None
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+
+@dataclass
+class LoadReport:
+    stages: List[Stats] = field(default_factory=list)
+    timeline: List[Stats] = field(default_factory=list)
+    steps: List[Stats] = field(default_factory=list)
+    rss_start_kb: Optional[int] = None
+    rss_end_kb: Optional[int] = None
+
+    @property
+    def ceiling(self) -> Optional[Stats]:
+        """The stage with the highest throughput."""
+
+        return max(self.stages, key=lambda stage: stage.throughput, default=None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["ceiling"] = asdict(self.ceiling) if self.ceiling else None
+        return data
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarise(label: str, samples: List[Sample], duration: float) -> Stats:
+    latencies = [sample.latency * 1000 for sample in samples]
+    return Stats(
+        label=label,
+        requests=len(samples),
+        errors=sum(1 for sample in samples if not sample.ok),
+        throughput=len(samples) / duration if duration > 0 else 0.0,
+        p50=percentile(latencies, 0.50),
+        p95=percentile(latencies, 0.95),
+        p99=percentile(latencies, 0.99),
+    )
+
+
+def rss_kb(pids: Iterable[int]) -> Optional[int]:
+    """Summed resident memory of ``pids`` from ``/proc`` (None where unavailable)."""
+
+    pids = list(pids)
+    if not pids:
+        return None
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status", encoding="ascii") as handle:
+                for line in handle:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            return None
+    return total
+
+
+class LoadTest:
+    """Runs virtual operators against a manager whose inventory points at a farm."""
+
+    def __init__(
+        self,
+        manager_url: str,
+        user: str,
+        password: str,
+        bulk_size: int = 5,
+        timeout: float = 30.0,
+        pids: Optional[List[int]] = None,
+    ) -> None:
+        self.manager_url = manager_url.rstrip("/")
+        self.user = user
+        self.password = password
+        self.bulk_size = bulk_size
+        self.timeout = timeout
+        # Without pids there is no memory figure: our own process is only the harness.
+        self.pids = pids or []
+        self.device_ids: List[str] = []
+        self._samples: List[Sample] = []
+        self._memory: List[Tuple[float, Optional[int]]] = []
+
+    def _login(self, session: Any) -> bool:
+        response = session.post(
+            f"{self.manager_url}/login",
+            data={"username": self.user, "password": self.password},
+            allow_redirects=False,
+            timeout=self.timeout,
+        )
+        return response.status_code in (302, 303)
+
+    def seed(self, player_urls: List[str]) -> None:
+        """Import the farm into the manager's inventory and remember the device ids."""
+
+        requests = _http()
+        lines = "".join(
+            json.dumps({"name": f"Loadtest {index}", "base_url": url, "username": "pi", "password": "pi", "tags": ["loadtest"]})
+            + "\n"
+            for index, url in enumerate(player_urls)
+        )
+        with requests.Session() as session:
+            if not self._login(session):
+                raise RuntimeError("Anmeldung am Manager fehlgeschlagen")
+            session.post(
+                f"{self.manager_url}/devices/import",
+                files={"file": ("loadtest.jsonl", lines.encode(), "application/x-ndjson")},
+                timeout=self.timeout,
+            )
+            export = session.get(f"{self.manager_url}/devices/export?format=jsonl&passwords=0", timeout=self.timeout)
+        wanted = {url.rstrip("/") for url in player_urls}
+        self.device_ids = [
+            record["id"]
+            for record in map(json.loads, export.text.splitlines())
+            if str(record.get("base_url", "")).rstrip("/") in wanted
+        ]
+        if not self.device_ids:
+            raise RuntimeError("Keine Loadtest-Geräte im Inventar gefunden")
+
+    def cleanup(self) -> None:
+        """Delete the seeded devices again, so a shared manager keeps its inventory."""
+
+        requests = _http()
+        with requests.Session() as session:
+            if not self._login(session):
+                raise RuntimeError("Anmeldung am Manager fehlgeschlagen")
+            for device_id in self.device_ids:
+                session.post(f"{self.manager_url}/devices/{device_id}/delete", allow_redirects=False, timeout=self.timeout)
+        self.device_ids = []
+
+    def _timed(self, step: str, func: Any) -> None:
+        begun, started = time.monotonic(), time.perf_counter()
+        try:
+            ok = bool(func())
+        except Exception:  # noqa: BLE001 - every failure counts as an error sample
+            ok = False
+        self._samples.append(Sample(begun, step, time.perf_counter() - started, ok))
+
+    def run_session(self) -> None:
+        """One scripted operator session."""
+
+        requests = _http()
+        base = self.manager_url
+        device_id = random.choice(self.device_ids)
+        with requests.Session() as session:
+            self._timed("login", lambda: self._login(session))
+            self._timed("dashboard", lambda: session.get(f"{base}/", timeout=self.timeout).ok)
+            self._timed("detail", lambda: session.get(f"{base}/devices/{device_id}", timeout=self.timeout).ok)
+            self._timed(
+                "preview",
+                lambda: session.get(
+                    f"{base}/devices/{device_id}/preview",
+                    params={"source": "local", "path": "bild.jpg"},
+                    allow_redirects=False,
+                    timeout=self.timeout,
+                ).status_code
+                == 200,
+            )
+
+            def bulk_action() -> bool:
+                targets = random.sample(self.device_ids, min(self.bulk_size, len(self.device_ids)))
+                return all(
+                    session.post(
+                        f"{base}/devices/{target}/player",
+                        data={"action": "reload"},
+                        allow_redirects=False,
+                        timeout=self.timeout,
+                    ).status_code
+                    in (302, 303)
+                    for target in targets
+                )
+
+            self._timed("bulk_action", bulk_action)
+
+    def _operator(self, stop: threading.Event) -> None:
+        while not stop.is_set():
+            self.run_session()
+
+    def _sample_memory(self, stop: threading.Event, interval: float) -> None:
+        while True:
+            self._memory.append((time.monotonic(), rss_kb(self.pids)))
+            if stop.wait(interval):
+                return
+
+    def run(self, stages: List[int], stage_seconds: float, interval: float = 10.0) -> LoadReport:
+        """Ramp through ``stages`` (concurrent operators), ``stage_seconds`` each."""
+
+        report = LoadReport(rss_start_kb=rss_kb(self.pids))
+        begin = time.monotonic()
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample_memory, args=(stop, min(interval, 1.0)), daemon=True)
+        sampler.start()
+        operators: List[threading.Thread] = []
+        for concurrency in stages:
+            while len(operators) < concurrency:
+                thread = threading.Thread(target=self._operator, args=(stop,), daemon=True)
+                thread.start()
+                operators.append(thread)
+            stage_start = time.monotonic()
+            time.sleep(stage_seconds)
+            stage_end = time.monotonic()
+            samples = [sample for sample in self._samples if stage_start <= sample.started < stage_end]
+            stats = summarise(f"{concurrency}", samples, stage_end - stage_start)
+            stats.rss_kb = rss_kb(self.pids)
+            report.stages.append(stats)
+        stop.set()
+        for thread in [sampler, *operators]:
+            thread.join(timeout=self.timeout)
+        end = time.monotonic()
+
+        report.timeline = self._timeline(begin, end, interval)
+        report.steps = [
+            summarise(step, [sample for sample in self._samples if sample.step == step], end - begin)
+            for step in SESSION_STEPS
+        ]
+        report.rss_end_kb = rss_kb(self.pids)
+        return report
+
+    def _timeline(self, begin: float, end: float, interval: float) -> List[Stats]:
+        buckets: Dict[int, List[Sample]] = {}
+        for sample in self._samples:
+            buckets.setdefault(int((sample.started - begin) // interval), []).append(sample)
+        timeline = []
+        for index in range(int((end - begin) // interval) + 1):
+            if not buckets.get(index):
+                continue
+            bucket_end = begin + (index + 1) * interval
+            stats = summarise(f"{index * interval:.0f}s", buckets[index], min(interval, end - bucket_end + interval))
+            readings = [rss for moment, rss in self._memory if moment < bucket_end and rss is not None]
+            stats.rss_kb = readings[-1] if readings else None
+            timeline.append(stats)
+        return timeline
+
+
+def format_report(report: LoadReport) -> str:
+    lines: List[str] = []
+
+    def table(title: str, rows: List[Stats], first: str) -> None:
+        lines.append(title)
+        lines.append(f"{first:>12} {'Anfragen':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Fehler':>7} {'RSS MB':>8}")
+        for row in rows:
+            rss = f"{row.rss_kb / 1024:.1f}" if row.rss_kb is not None else "–"
+            lines.append(
+                f"{row.label:>12} {row.requests:>9} {row.throughput:>8.1f} {row.p50:>8.1f} {row.p95:>8.1f} "
+                f"{row.p99:>8.1f} {row.error_rate:>6.1%} {rss:>8}"
+            )
+        lines.append("")
+
+    table("Stufen (gleichzeitige Bediener)", report.stages, "Bediener")
+    table("Zeitverlauf", report.timeline, "ab")
+    table("Sitzungsschritte", report.steps, "Schritt")
+    ceiling = report.ceiling
+    if ceiling:
+        lines.append(
+            f"Durchsatzgrenze: {ceiling.throughput:.1f} req/s bei {ceiling.label} Bedienern "
+            f"(p99 {ceiling.p99:.0f} ms, Fehler {ceiling.error_rate:.1%})"
+        )
+    if report.rss_start_kb is not None and report.rss_end_kb is not None:
+        lines.append(
+            f"Speicher: {report.rss_start_kb / 1024:.1f} MB → {report.rss_end_kb / 1024:.1f} MB "
+            f"({(report.rss_end_kb - report.rss_start_kb) / 1024:+.1f} MB)"
+        )
+    return "\n".join(lines)
+
+
+def parse_stages(value: str) -> List[int]:
+    stages = [int(part) for part in value.replace(",", " ").split()]
+    if not stages or any(stage < 1 for stage in stages):
+        raise ValueError("Stufen müssen positive Ganzzahlen sein, z. B. 1,2,4,8")
+    return stages
+
+
+def run(
+    stages: List[int],
+    stage_seconds: float,
+    players: int = 50,
+    latency: float = 0.02,
+    error_rate: float = 0.0,
+    bulk_size: int = 5,
+    interval: float = 10.0,
+    manager_url: Optional[str] = None,
+    user: str = "loadtest",
+    password: str = "loadtest",
+    pids: Optional[List[int]] = None,
+    farm_host: str = "127.0.0.1",
+    workers: int = 3,
+    preload: bool = False,
+) -> Tuple[LoadReport, str]:
+    """Start the farm (and a local manager unless ``manager_url`` is given) and run the test.
+
+    The local manager runs under gunicorn with ``workers`` processes and its
+    memory is sampled. Against an existing manager the farm must listen on
+    ``farm_host``, an address the manager can reach; the seeded devices are
+    deleted afterwards and memory is only measured for the given ``pids``.
+    """
+
+    farm = PlayerFarm(players, latency, error_rate, farm_host).start()
+    local: Optional[LocalManager] = None
+    test: Optional[LoadTest] = None
+    try:
+        if manager_url is None:
+            local = LocalManager(user, password, workers, preload).start()
+            manager_url = local.url
+            pids = pids or local.pids()
+        test = LoadTest(manager_url, user, password, bulk_size=bulk_size, pids=pids)
+        test.seed(farm.player_urls())
+        report = test.run(stages, stage_seconds, interval)
+    finally:
+        try:
+            if local is None and test is not None and test.device_ids:
+                test.cleanup()
+        finally:
+            if local is not None:
+                local.stop()
+            farm.stop()
+    return report, manager_url
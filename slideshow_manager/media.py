@@ -0,0 +1,116 @@
+"""Cached media browsing for device sources.
+
+Directory listings are fetched once per ``(device, source, directory)``
+and kept for a configurable TTL in the shared cache, so paging through a
+share with thousands of images does not re-list it on every click. Preview
+images go through the same cache before they are requested again; failed
+previews are remembered briefly too, so a page of broken thumbnails does not
+hit the device once per image and reload.
+"""
+from __future__ import annotations
+
+import math
+import posixpath
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from .cache import Cache, device_key
+from .clients import RemoteAPIError, SlideshowClient
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm"}
+
+
+@dataclass
+class MediaEntry:
+    name: str
+    path: str
+    kind: str
+    size: Optional[int] = None
+
+    @property
+    def is_dir(self) -> bool:
+        return self.kind == "directory"
+
+    @property
+    def is_image(self) -> bool:
+        return self.kind == "image"
+
+
+@dataclass
+class MediaPage:
+    entries: List[MediaEntry]
+    page: int
+    pages: int
+    total: int
+
+
+def _normalise(directory: str, raw: Dict[str, Any]) -> MediaEntry:
+    name = str(raw.get("name") or posixpath.basename(str(raw.get("path", ""))))
+    path = str(raw.get("path") or posixpath.join(directory, name)).lstrip("/")
+    kind = str(raw.get("type", ""))
+    if raw.get("is_dir") or kind in {"dir", "directory", "folder"}:
+        kind = "directory"
+    elif kind not in {"image", "video"}:
+        extension = posixpath.splitext(name)[1].lower()
+        kind = "image" if extension in IMAGE_EXTENSIONS else "video" if extension in VIDEO_EXTENSIONS else "file"
+    size = raw.get("size")
+    return MediaEntry(name=name, path=path, kind=kind, size=int(size) if isinstance(size, (int, float)) else None)
+
+
+def paginate(entries: List[MediaEntry], page: int, per_page: int) -> MediaPage:
+    pages = max(1, math.ceil(len(entries) / per_page))
+    page = min(max(1, page), pages)
+    start = (page - 1) * per_page
+    return MediaPage(entries=entries[start:start + per_page], page=page, pages=pages, total=len(entries))
+
+
+class MediaBrowser:
+    """Lists source directories and previews through the shared cache."""
+
+    def __init__(
+        self, cache: Cache, listing_ttl: float = 300, preview_ttl: float = 600, preview_error_ttl: float = 60
+    ) -> None:
+        self.cache = cache
+        self.listing_ttl = listing_ttl
+        self.preview_ttl = preview_ttl
+        self.preview_error_ttl = preview_error_ttl
+
+    def list_directory(
+        self, device_id: str, client: SlideshowClient, source: str, path: str = "", refresh: bool = False
+    ) -> List[MediaEntry]:
+        path = path.strip("/")
+        key = device_key(device_id, "listing", source, path)
+        if not refresh:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return [MediaEntry(**entry) for entry in cached]
+        payload = client.list_media(source, path)
+        raw_entries = payload.get("entries", payload.get("items", [])) if isinstance(payload, dict) else payload
+        entries = sorted(
+            (_normalise(path, raw) for raw in raw_entries or [] if isinstance(raw, dict)),
+            key=lambda entry: (not entry.is_dir, entry.name.lower()),
+        )
+        self.cache.set(key, [asdict(entry) for entry in entries], self.listing_ttl)
+        return entries
+
+    def preview(self, device_id: str, client: SlideshowClient, source: str, media_path: str) -> bytes:
+        key = device_key(device_id, "preview", source, media_path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        error_key = device_key(device_id, "preview-error", source, media_path)
+        failure = self.cache.get(error_key)
+        if failure is not None:
+            raise RemoteAPIError(failure["message"], failure["status_code"])
+        try:
+            content = client.fetch_preview(source, media_path)
+        except RemoteAPIError as exc:
+            self.cache.set(error_key, {"message": str(exc), "status_code": exc.status_code}, self.preview_error_ttl)
+            raise
+        self.cache.set(key, content, self.preview_ttl)
+        return content
+
+    def invalidate_device(self, device_id: str) -> None:
+        self.cache.delete_prefix(device_key(device_id, ""))
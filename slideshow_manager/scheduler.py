@@ -0,0 +1,650 @@
+"""Cron-style scheduled player actions.
+
+Schedules are stored as JSON next to the device inventory. A single leader
+process (elected through an advisory file lock, so only one gunicorn worker
+executes them) keeps the next firing time of every schedule in a heap and
+sleeps until the earliest one is due. Missed runs inside the catch-up window
+are executed once after a restart and every execution is appended to a
+history log.
+"""
+from __future__ import annotations
+
+import atexit
+import fcntl
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import Blueprint, Flask, Response, current_app, flash, redirect, render_template, request, url_for
+
+from .audit import audit
+from .auth import login_required
+from .cache import forget_device_state
+from .clients import RemoteAPIError, RemoteCall, RemoteDevice, build_transport, send_batch
+from .storage import Device
+
+
+bp = Blueprint("schedules", __name__)
+
+ACTIONS = {
+    "player:start": "Player starten",
+    "player:stop": "Player stoppen",
+    "player:reload": "Player neu laden",
+    "info_screen:on": "Infobildschirm an",
+    "info_screen:off": "Infobildschirm aus",
+    "playback": "Wiedergabe anpassen",
+}
+
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+class ScheduleError(ValueError):
+    """Raised for invalid schedule definitions."""
+
+
+class CronExpression:
+    """Five-field cron expression (minute hour day-of-month month day-of-week)."""
+
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str) -> None:
+        self.expression = expression.strip()
+        fields = _ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ScheduleError(f"Ungültiger Cron-Ausdruck '{expression}': fünf Felder erwartet")
+        try:
+            parsed = [self._parse_field(value, low, high) for value, (low, high) in zip(fields, self._RANGES)]
+        except ValueError as exc:
+            raise ScheduleError(f"Ungültiger Cron-Ausdruck '{expression}'") from exc
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # 7 is an alias for Sunday.
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(value: str, low: int, high: int) -> Set[int]:
+        result: Set[int] = set()
+        for part in value.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start_text, end_text = part.split("-", 1)
+                start, end = int(start_text), int(end_text)
+            elif part.isdigit():
+                start = end = int(part)
+                if step != 1:
+                    end = high
+            else:
+                raise ScheduleError(f"Ungültiges Cron-Feld '{value}'")
+            if step < 1 or start < low or end > high or start > end:
+                raise ScheduleError(f"Ungültiges Cron-Feld '{value}'")
+            result.update(range(start, end + 1, step))
+        return result
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        # Classic cron semantics: if both day fields are restricted either may match.
+        if not self._any_day and not self._any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Return the first matching minute strictly after ``moment``."""
+
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            later = [minute for minute in self.minutes if minute >= candidate.minute]
+            if not later:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            return candidate.replace(minute=min(later))
+        raise ScheduleError(f"Cron-Ausdruck '{self.expression}' trifft nie zu")
+
+
+@dataclass
+class Schedule:
+    """A recurring action for one device or every device carrying a tag."""
+
+    id: str
+    name: str
+    cron: str
+    action: str
+    device_id: Optional[str] = None
+    tag: Optional[str] = None
+    payload: Dict[str, Any] = field(default_factory=dict)
+    enabled: bool = True
+    created_at: str = ""
+    last_run: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Schedule":
+        return cls(
+            id=str(data.get("id")),
+            name=str(data.get("name", "")),
+            cron=str(data.get("cron", "")),
+            action=str(data.get("action", "")),
+            device_id=(str(data["device_id"]) if data.get("device_id") else None),
+            tag=(str(data["tag"]) if data.get("tag") else None),
+            payload=dict(data.get("payload") or {}),
+            enabled=bool(data.get("enabled", True)),
+            created_at=str(data.get("created_at", "")),
+            last_run=(str(data["last_run"]) if data.get("last_run") else None),
+        )
+
+    @property
+    def expression(self) -> CronExpression:
+        return CronExpression(self.cron)
+
+    def baseline(self) -> datetime:
+        """Point in time from which the next due run is computed."""
+
+        return datetime.fromisoformat(self.last_run or self.created_at)
+
+
+def _tail_lines(path: Path, count: int, block_size: int = 8192) -> List[bytes]:
+    """The last ``count`` lines of ``path``, read backwards block by block."""
+
+    if count <= 0:
+        return []
+    try:
+        handle = path.open("rb")
+    except FileNotFoundError:
+        return []
+    with handle:
+        position = handle.seek(0, 2)
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            handle.seek(position)
+            data = handle.read(step) + data
+    return [line for line in data.splitlines() if line.strip()][-count:]
+
+
+class ScheduleStorage:
+    """JSON backed storage for schedules plus an append-only execution history.
+
+    The history file is rotated to ``*.jsonl.1`` once it would exceed
+    ``history_max_bytes``, so at most two generations are kept on disk.
+    """
+
+    def __init__(self, path: str, history_max_bytes: int = 5 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.history_path = self.path.with_name(self.path.stem + "_history.jsonl")
+        self.history_max_bytes = history_max_bytes
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists():
+            self._write([])
+
+    def after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def _read(self) -> List[Dict[str, Any]]:
+        with self.path.open("r", encoding="utf-8") as handle:
+            return json.load(handle)
+
+    def _write(self, data: Iterable[Dict[str, object]]) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(list(data), handle, indent=2, ensure_ascii=False)
+        tmp_path.replace(self.path)
+
+    def mtime(self) -> int:
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def list_schedules(self) -> List[Schedule]:
+        with self._lock:
+            return [Schedule.from_dict(item) for item in self._read()]
+
+    def get(self, schedule_id: str) -> Optional[Schedule]:
+        for schedule in self.list_schedules():
+            if schedule.id == schedule_id:
+                return schedule
+        return None
+
+    def add(self, data: Dict[str, Any]) -> Schedule:
+        schedule = Schedule(
+            id=uuid.uuid4().hex,
+            name=str(data.get("name", "")).strip(),
+            cron=str(data.get("cron", "")).strip(),
+            action=str(data.get("action", "")),
+            device_id=(str(data["device_id"]) if data.get("device_id") else None),
+            tag=(str(data["tag"]).strip() if data.get("tag") else None),
+            payload=dict(data.get("payload") or {}),
+            enabled=bool(data.get("enabled", True)),
+            created_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        validate_schedule(schedule)
+        with self._lock:
+            schedules = self._read()
+            schedules.append(schedule.to_dict())
+            self._write(schedules)
+        return schedule
+
+    def update(self, schedule_id: str, updates: Dict[str, Any]) -> Optional[Schedule]:
+        with self._lock:
+            schedules = self._read()
+            for index, item in enumerate(schedules):
+                if str(item.get("id")) == schedule_id:
+                    merged = {**item, **updates, "id": item.get("id")}
+                    updated = Schedule.from_dict(merged)
+                    validate_schedule(updated)
+                    schedules[index] = updated.to_dict()
+                    self._write(schedules)
+                    return updated
+        return None
+
+    def delete(self, schedule_id: str) -> bool:
+        with self._lock:
+            schedules = self._read()
+            filtered = [item for item in schedules if str(item.get("id")) != schedule_id]
+            if len(filtered) == len(schedules):
+                return False
+            self._write(filtered)
+            return True
+
+    @property
+    def rotated_history_path(self) -> Path:
+        return self.history_path.with_suffix(".jsonl.1")
+
+    def append_history(self, entry: Dict[str, Any]) -> None:
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                size = self.history_path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if size and size + len(line) > self.history_max_bytes:
+                self.history_path.replace(self.rotated_history_path)
+            with self.history_path.open("ab") as handle:
+                handle.write(line)
+
+    def history(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest ``limit`` entries, read from the end of the history files."""
+
+        with self._lock:
+            lines = _tail_lines(self.history_path, limit)
+            lines = _tail_lines(self.rotated_history_path, limit - len(lines)) + lines
+        return [json.loads(line) for line in reversed(lines)]
+
+
+def validate_schedule(schedule: Schedule) -> None:
+    if not schedule.name:
+        raise ScheduleError("Name ist erforderlich")
+    if schedule.action not in ACTIONS:
+        raise ScheduleError(f"Unbekannte Aktion '{schedule.action}'")
+    if bool(schedule.device_id) == bool(schedule.tag):
+        raise ScheduleError("Entweder ein Gerät oder ein Tag angeben")
+    schedule.expression.next_after(datetime.now())
+
+
+def action_call(device: RemoteDevice, schedule: Schedule) -> RemoteCall:
+    """The API call that performs the action of ``schedule`` on ``device``."""
+
+    kind, _, argument = schedule.action.partition(":")
+    if kind == "player":
+        return RemoteCall(device, "POST", f"/api/player/{argument}")
+    if kind == "info_screen":
+        return RemoteCall(device, "POST", "/api/player/info-screen", {"enabled": argument == "on"})
+    if kind == "playback":
+        return RemoteCall(device, "PUT", "/api/playback", schedule.payload)
+    raise ScheduleError(f"Unbekannte Aktion '{schedule.action}'")
+
+
+class LeaderLock:
+    """Non-blocking advisory file lock used to elect the scheduling process."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._handle: Optional[Any] = None
+
+    def acquire(self) -> bool:
+        if self._handle is not None:
+            return True
+        handle = self.path.open("a")
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def release(self) -> None:
+        if self._handle is not None:
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+
+
+class Scheduler:
+    """Heap based timer that fires due schedules.
+
+    Between firings the thread sleeps until the earliest due time (or the
+    poll interval, used to pick up schedules changed by other processes), so
+    the cost does not grow with the number of idle schedules.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        schedules: ScheduleStorage,
+        catchup_seconds: int = 900,
+        poll_interval: float = 30.0,
+    ) -> None:
+        self.app = app
+        self.schedules = schedules
+        self.catchup = timedelta(seconds=catchup_seconds)
+        self.poll_interval = poll_interval
+        self.leader = LeaderLock(schedules.path.with_suffix(".lock"))
+        self._heap: List[Tuple[datetime, int, str, datetime, bool]] = []
+        self._loaded: Dict[str, Schedule] = {}
+        self._counter = itertools.count()
+        self._mtime = -1
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def rebuild(self, now: datetime) -> None:
+        """Recompute the heap from storage, queueing missed runs for catch-up."""
+
+        self._mtime = self.schedules.mtime()
+        self._heap = []
+        self._loaded = {}
+        for schedule in self.schedules.list_schedules():
+            if not schedule.enabled:
+                continue
+            try:
+                expression = schedule.expression
+                due = expression.next_after(schedule.baseline())
+            except (ScheduleError, ValueError):
+                continue
+            self._loaded[schedule.id] = schedule
+            if due <= now:
+                # Only the latest missed slot is caught up, and only it can lie
+                # inside the window, so the walk starts just before the window.
+                slot = expression.next_after(max(schedule.baseline(), now - self.catchup - timedelta(minutes=1)))
+                missed: Optional[datetime] = None
+                while slot <= now:
+                    missed, slot = slot, expression.next_after(slot)
+                if missed is not None and now - missed <= self.catchup:
+                    self._push(now, schedule.id, missed, True)
+                    continue
+                due = slot
+            self._push(due, schedule.id, due, False)
+
+    def _push(self, when: datetime, schedule_id: str, scheduled_for: datetime, catch_up: bool) -> None:
+        heapq.heappush(self._heap, (when, next(self._counter), schedule_id, scheduled_for, catch_up))
+
+    def next_due(self) -> Optional[datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    def run_pending(self, now: Optional[datetime] = None) -> int:
+        """Execute every schedule due at ``now``. Returns the number of runs."""
+
+        now = now or datetime.now()
+        if self.schedules.mtime() != self._mtime:
+            self.rebuild(now)
+        executed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, _, schedule_id, scheduled_for, catch_up = heapq.heappop(self._heap)
+            schedule = self._loaded.get(schedule_id)
+            if schedule is None:
+                continue
+            try:
+                self._fire(schedule, scheduled_for, catch_up)
+                executed += 1
+            finally:
+                # Always queue the next slot, even if this run failed, and skip
+                # slots that passed while we were busy instead of replaying them.
+                upcoming = schedule.expression.next_after(max(scheduled_for, now))
+                self._push(upcoming, schedule_id, upcoming, False)
+        return executed
+
+    def _targets(self, schedule: Schedule) -> List[Device]:
+        devices = self.app.storage.list_devices()  # type: ignore[attr-defined]
+        if schedule.device_id:
+            return [device for device in devices if device.id == schedule.device_id]
+        return [device for device in devices if schedule.tag in device.tags]
+
+    def _fire(self, schedule: Schedule, scheduled_for: datetime, catch_up: bool) -> None:
+        config = self.app.config
+        timeout = int(config.get("REMOTE_TIMEOUT", 8))
+        devices = self._targets(schedule)
+        started = time.perf_counter()
+        outcomes: List[Any]
+        try:
+            # One batch for all target devices: a single gateway round trip, and
+            # offline devices time out concurrently instead of one after another.
+            calls = [
+                action_call(RemoteDevice(device.base_url, device.username, device.password), schedule)
+                for device in devices
+            ]
+            outcomes = send_batch(calls, build_transport(config), timeout)
+        except (RemoteAPIError, ScheduleError) as exc:
+            outcomes = [exc] * len(devices)
+        except Exception as exc:  # noqa: BLE001 - record the failure instead of losing the run
+            self.app.logger.exception("Zeitplan %s fehlgeschlagen", schedule.id)
+            outcomes = [RemoteAPIError(f"Unerwarteter Fehler: {exc}")] * len(devices)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        results: List[Dict[str, Any]] = []
+        for device, outcome in zip(devices, outcomes):
+            failed = isinstance(outcome, Exception)
+            entry: Dict[str, Any] = {
+                "device_id": device.id,
+                "device_name": device.name,
+                "ok": not failed,
+                "message": str(outcome) if failed else "",
+            }
+            self.app.audit.record(  # type: ignore[attr-defined]
+                f"schedule:{schedule.action}",
+                user="scheduler",
+                device_id=device.id,
+                payload={"schedule_id": schedule.id, "name": schedule.name, **schedule.payload},
+                result="error" if failed else "ok",
+                message=entry["message"],
+                latency_ms=latency_ms,
+            )
+            forget_device_state(self.app.cache, device.id)  # type: ignore[attr-defined]
+            results.append(entry)
+
+        self.schedules.append_history(
+            {
+                "schedule_id": schedule.id,
+                "name": schedule.name,
+                "action": schedule.action,
+                "scheduled_for": scheduled_for.isoformat(timespec="seconds"),
+                "executed_at": datetime.now().isoformat(timespec="seconds"),
+                "catch_up": catch_up,
+                "results": results,
+            }
+        )
+        # Our own bookkeeping write must not trigger a full rebuild, but an edit
+        # another worker made while the batch ran must: then _mtime stays stale.
+        unchanged = self.schedules.mtime() == self._mtime
+        self.schedules.update(schedule.id, {"last_run": scheduled_for.isoformat(timespec="seconds")})
+        if unchanged:
+            self._mtime = self.schedules.mtime()
+
+    def notify(self) -> None:
+        """Wake the scheduler thread, e.g. after a schedule was edited."""
+
+        self._mtime = -1
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="slideshow-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.leader.release()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if not self.leader.acquire():
+                # Another process is the leader; retry in case it goes away.
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                self.run_pending()
+            except Exception:  # pragma: no cover - keep the scheduler alive
+                self.app.logger.exception("Zeitplan-Ausführung fehlgeschlagen")
+            timeout = self.poll_interval
+            due = self.next_due()
+            if due is not None:
+                timeout = max(0.0, min(timeout, (due - datetime.now()).total_seconds()))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+
+def start_scheduler(app: Flask) -> Scheduler:
+    scheduler = Scheduler(
+        app,
+        app.schedules,  # type: ignore[attr-defined]
+        catchup_seconds=int(app.config.get("SCHEDULER_CATCHUP_SECONDS", 900)),
+        poll_interval=float(app.config.get("SCHEDULER_POLL_INTERVAL", 30)),
+    )
+    scheduler.start()
+    atexit.register(scheduler.stop)
+    return scheduler
+
+
+def _payload_from_form(form: Any) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {}
+    for key, cast in (("image_duration", int), ("transition_duration", float), ("image_rotation", int)):
+        try:
+            if form.get(key):
+                payload[key] = cast(form.get(key))
+        except ValueError:
+            continue
+    for key in ("transition_type", "image_fit"):
+        if form.get(key):
+            payload[key] = form.get(key)
+    return payload
+
+
+@bp.route("/schedules", methods=["GET", "POST"])
+@login_required
+def schedules() -> Response:
+    storage = current_app.schedules  # type: ignore[attr-defined]
+    if request.method == "POST":
+        form = request.form
+        target = form.get("target", "")
+        data = {
+            "name": form.get("name", ""),
+            "cron": form.get("cron", ""),
+            "action": form.get("action", ""),
+            "device_id": target[len("device:"):] if target.startswith("device:") else None,
+            "tag": form.get("tag") if target == "tag" else None,
+            "payload": _payload_from_form(form) if form.get("action") == "playback" else {},
+        }
+        try:
+            created = storage.add(data)
+        except ScheduleError as exc:
+            flash(str(exc), "danger")
+        else:
+            audit("schedule.create", device_id=created.device_id, payload=created.to_dict())
+            _notify_scheduler()
+            flash("Zeitplan angelegt.", "success")
+            return redirect(url_for("schedules.schedules"))
+
+    devices = {device.id: device for device in current_app.storage.list_devices()}  # type: ignore[attr-defined]
+    entries = []
+    for schedule in storage.list_schedules():
+        try:
+            next_run = schedule.expression.next_after(datetime.now()) if schedule.enabled else None
+        except ScheduleError:
+            next_run = None
+        entries.append({"schedule": schedule, "next_run": next_run})
+    return render_template(
+        "schedules.html",
+        entries=entries,
+        devices=devices,
+        actions=ACTIONS,
+        history=storage.history(limit=int(current_app.config.get("SCHEDULE_HISTORY_LIMIT", 50))),
+    )
+
+
+@bp.route("/schedules/<schedule_id>/toggle", methods=["POST"])
+@login_required
+def schedule_toggle(schedule_id: str) -> Response:
+    storage = current_app.schedules  # type: ignore[attr-defined]
+    schedule = storage.get(schedule_id)
+    if not schedule:
+        flash("Zeitplan nicht gefunden.", "danger")
+    else:
+        storage.update(schedule_id, {"enabled": not schedule.enabled})
+        audit(
+            "schedule.toggle",
+            device_id=schedule.device_id,
+            payload={"schedule_id": schedule_id},
+            diff={"enabled": [schedule.enabled, not schedule.enabled]},
+        )
+        _notify_scheduler()
+        flash("Zeitplan aktualisiert.", "success")
+    return redirect(url_for("schedules.schedules"))
+
+
+@bp.route("/schedules/<schedule_id>/delete", methods=["POST"])
+@login_required
+def schedule_delete(schedule_id: str) -> Response:
+    storage = current_app.schedules  # type: ignore[attr-defined]
+    schedule = storage.get(schedule_id)
+    if schedule and storage.delete(schedule_id):
+        audit("schedule.delete", device_id=schedule.device_id, payload=schedule.to_dict())
+        _notify_scheduler()
+        flash("Zeitplan gelöscht.", "info")
+    else:
+        flash("Zeitplan konnte nicht gelöscht werden.", "danger")
+    return redirect(url_for("schedules.schedules"))
+
+
+def _notify_scheduler() -> None:
+    scheduler = getattr(current_app, "scheduler", None)
+    if scheduler is not None:
+        scheduler.notify()
@@ -0,0 +1,69 @@
+"""Startup measurements for ``python -m slideshow_manager startup``.
+
+Every run starts a fresh interpreter, the same way a gunicorn worker does
+after a restart, and times the import of the package plus ``create_app``.
+The import profile is taken from ``python -X importtime``.
+"""
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+from slideshow_manager import create_app
+create_app({"STORAGE_PATH": sys.argv[1]})
+print(time.perf_counter() - start)
+"""
+
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+def _run(args: List[str], storage: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args, "-c", _SNIPPET, storage],
+        cwd=_PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure(runs: int = 5) -> Dict[str, Dict[str, float]]:
+    """Return min/median/max milliseconds for ``create_app`` and the whole process."""
+
+    app_times: List[float] = []
+    process_times: List[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = str(Path(tmp) / "devices.json")
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = _run([], storage)
+            process_times.append((time.perf_counter() - start) * 1000)
+            app_times.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+
+    def summary(values: List[float]) -> Dict[str, float]:
+        return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+    return {"create_app_ms": summary(app_times), "process_ms": summary(process_times)}
+
+
+def import_profile(top: int = 15) -> List[Tuple[int, str]]:
+    """Return the ``top`` imports by cumulative time in microseconds."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = _run(["-X", "importtime"], str(Path(tmp) / "devices.json"))
+    entries: List[Tuple[int, str]] = []
+    for line in result.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or "cumulative" in line:
+            continue
+        entries.append((int(fields[1]), fields[2].rstrip()))
+    return sorted(entries, reverse=True)[:top]
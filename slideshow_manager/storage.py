@@ -6,7 +6,10 @@ import threading
 import uuid
 from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+DEFAULT_STORAGE_PATH = "slideshow_manager/data/devices.json"
 
 
 @dataclass
@@ -50,6 +53,11 @@ class DeviceStorage:
         if not self.path.exists():
             self._write([])
 
+    def after_fork(self) -> None:
+        """Replace the lock, which may have been held by another thread at fork time."""
+
+        self._lock = threading.Lock()
+
     def _read(self) -> List[Dict[str, object]]:
         with self.path.open("r", encoding="utf-8") as handle:
             return json.load(handle)
@@ -64,6 +72,14 @@ class DeviceStorage:
         with self._lock:
             return [Device.from_dict(item) for item in self._read()]
 
+    def iter_devices(self) -> Iterator[Device]:
+        """Yield devices one by one instead of building a list of objects."""
+
+        with self._lock:
+            items = self._read()
+        for item in items:
+            yield Device.from_dict(item)
+
     def get(self, device_id: str) -> Optional[Device]:
         with self._lock:
             for item in self._read():
@@ -71,22 +87,37 @@ class DeviceStorage:
                     return Device.from_dict(item)
         return None
 
+    @staticmethod
+    def _build_device(data: Dict[str, object], device_id: Optional[str] = None) -> Device:
+        return Device(
+            id=device_id or uuid.uuid4().hex,
+            name=str(data.get("name", "")).strip(),
+            base_url=str(data.get("base_url", "")).strip(),
+            username=str(data.get("username", "")).strip(),
+            password=str(data.get("password", "")),
+            notes=(str(data["notes"]).strip() if data.get("notes") else None),
+            tags=[tag.strip() for tag in data.get("tags", []) if tag.strip()],
+        )
+
     def add(self, data: Dict[str, object]) -> Device:
         with self._lock:
             devices = self._read()
-            new_device = Device(
-                id=uuid.uuid4().hex,
-                name=str(data.get("name", "")).strip(),
-                base_url=str(data.get("base_url", "")).strip(),
-                username=str(data.get("username", "")).strip(),
-                password=str(data.get("password", "")),
-                notes=(str(data["notes"]).strip() if data.get("notes") else None),
-                tags=[tag.strip() for tag in data.get("tags", []) if tag.strip()],
-            )
+            new_device = self._build_device(data)
             devices.append(new_device.to_dict())
             self._write(devices)
         return new_device
 
+    def add_many(self, items: Iterable[Dict[str, object]]) -> List[Device]:
+        """Add several devices with a single file rewrite."""
+
+        with self._lock:
+            devices = self._read()
+            new_devices = [self._build_device(data) for data in items]
+            if new_devices:
+                devices.extend(device.to_dict() for device in new_devices)
+                self._write(devices)
+        return new_devices
+
     def update(self, device_id: str, updates: Dict[str, object]) -> Optional[Device]:
         with self._lock:
             devices = self._read()
@@ -111,3 +142,40 @@ class DeviceStorage:
                 return False
             self._write(filtered)
             return True
+
+    def upsert_many(
+        self, items: Iterable[Dict[str, object]]
+    ) -> List[Tuple[Optional[Dict[str, object]], Dict[str, object]]]:
+        """Create or update devices with a single file rewrite.
+
+        Existing devices are matched by ``id`` first and by ``base_url``
+        otherwise. Empty passwords keep the stored password. Returns one
+        ``(before, after)`` pair per imported row; ``before`` is ``None`` for
+        created devices.
+        """
+
+        changes: List[Tuple[Optional[Dict[str, object]], Dict[str, object]]] = []
+        with self._lock:
+            devices = self._read()
+            by_id = {str(item.get("id")): index for index, item in enumerate(devices)}
+            by_url = {str(item.get("base_url", "")).rstrip("/"): index for index, item in enumerate(devices)}
+            for data in items:
+                index = by_id.get(str(data.get("id") or ""))
+                if index is None:
+                    index = by_url.get(str(data.get("base_url", "")).strip().rstrip("/"))
+                if index is None:
+                    new_device = self._build_device(data, str(data.get("id") or "") or None)
+                    devices.append(new_device.to_dict())
+                    by_id[new_device.id] = by_url[new_device.base_url.rstrip("/")] = len(devices) - 1
+                    changes.append((None, devices[-1]))
+                    continue
+                current = devices[index]
+                merged = {**current, **{key: value for key, value in data.items() if key != "id"}}
+                if not data.get("password"):
+                    merged["password"] = current.get("password", "")
+                merged["tags"] = [tag.strip() for tag in merged.get("tags", []) if tag and tag.strip()]
+                devices[index] = Device.from_dict(merged).to_dict()
+                changes.append((current, devices[index]))
+            if changes:
+                self._write(devices)
+        return changes
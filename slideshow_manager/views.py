@@ -1,6 +1,7 @@
 """Dashboard and device management views."""
 from __future__ import annotations
 
+import time
 from typing import Any, Callable, Dict, Optional
 
 from flask import (
@@ -16,8 +17,18 @@ from flask import (
     url_for,
 )
 
+from .audit import audit, diff_dicts
 from .auth import login_required
-from .clients import RemoteAPIError, RemoteDevice, SlideshowClient
+from .clients import (
+    RemoteAPIError,
+    RemoteDevice,
+    SlideshowClient,
+    Transport,
+    build_transport,
+    fetch_states,
+)
+from .cache import device_key, forget_device_state
+from .media import MediaPage, paginate
 from .storage import Device
 
 
@@ -29,10 +40,39 @@ def _load_logged_in_user() -> None:
     g.user = session.get("user_id")
 
 
+def _remote_from_device(device: Device) -> RemoteDevice:
+    return RemoteDevice(device.base_url, device.username, device.password)
+
+
+def _transport() -> Transport:
+    return build_transport(current_app.config)
+
+
 def _client_from_device(device: Device) -> SlideshowClient:
-    remote = RemoteDevice(device.base_url, device.username, device.password)
     timeout = int(current_app.config.get("REMOTE_TIMEOUT", 8))
-    return SlideshowClient(remote, timeout=timeout)
+    return SlideshowClient(_remote_from_device(device), timeout=timeout, transport=_transport())
+
+
+def _cached_states(devices: list[Device]) -> list[Any]:
+    """Device states from the shared cache; missing ones are fetched in one batch."""
+
+    cache = current_app.cache  # type: ignore[attr-defined]
+    ttl = float(current_app.config.get("STATE_CACHE_TTL", 5))
+    states: list[Any] = [cache.get(device_key(device.id, "state")) for device in devices]
+    missing = [index for index, state in enumerate(states) if state is None]
+    if not missing:
+        return states
+
+    timeout = int(current_app.config.get("REMOTE_TIMEOUT", 8))
+    try:
+        fetched = fetch_states([_remote_from_device(devices[index]) for index in missing], _transport(), timeout)
+    except RemoteAPIError as exc:
+        fetched = [exc] * len(missing)
+    for index, state in zip(missing, fetched):
+        states[index] = state
+        if not isinstance(state, RemoteAPIError):
+            cache.set(device_key(devices[index].id, "state"), state, ttl)
+    return states
 
 
 @bp.route("/")
@@ -41,13 +81,12 @@ def index() -> Response:
     storage = current_app.storage  # type: ignore[attr-defined]
     devices = storage.list_devices()
     summaries: list[dict[str, Any]] = []
-    for device in devices:
+    for device, state in zip(devices, _cached_states(devices)):
         summary: Dict[str, Any] = {"device": device, "state": None, "error": None}
-        try:
-            client = _client_from_device(device)
-            summary["state"] = client.get_state()
-        except RemoteAPIError as exc:
-            summary["error"] = str(exc)
+        if isinstance(state, RemoteAPIError):
+            summary["error"] = str(state)
+        else:
+            summary["state"] = state
         summaries.append(summary)
     return render_template("dashboard.html", summaries=summaries)
 
@@ -69,7 +108,7 @@ def device_create() -> Response:
             flash("Name, Basis-URL und Benutzername sind erforderlich.", "danger")
         else:
             storage = current_app.storage  # type: ignore[attr-defined]
-            storage.add(
+            device = storage.add(
                 {
                     "name": form.get("name"),
                     "base_url": form.get("base_url"),
@@ -79,6 +118,7 @@ def device_create() -> Response:
                     "tags": [tag.strip() for tag in form.get("tags", "").split(",") if tag.strip()],
                 }
             )
+            audit("device.create", device_id=device.id, diff=diff_dicts(None, device.to_dict()))
             flash("Gerät hinzugefügt.", "success")
             return redirect(url_for("dashboard.devices"))
     return render_template("devices/form.html", device=None)
@@ -103,7 +143,10 @@ def device_edit(device_id: str) -> Response:
             "notes": form.get("notes", ""),
             "tags": [tag.strip() for tag in form.get("tags", "").split(",") if tag.strip()],
         }
-        storage.update(device_id, updates)
+        before = device.to_dict()
+        updated = storage.update(device_id, updates)
+        audit("device.update", device_id=device_id, diff=diff_dicts(before, updated.to_dict() if updated else None))
+        current_app.media_browser.invalidate_device(device_id)  # type: ignore[attr-defined]
         flash("Gerät aktualisiert.", "success")
         return redirect(url_for("dashboard.devices"))
 
@@ -115,7 +158,10 @@ def device_edit(device_id: str) -> Response:
 @login_required
 def device_delete(device_id: str) -> Response:
     storage = current_app.storage  # type: ignore[attr-defined]
-    if storage.delete(device_id):
+    device = storage.get(device_id)
+    if device and storage.delete(device_id):
+        audit("device.delete", device_id=device_id, diff=diff_dicts(device.to_dict(), None))
+        current_app.media_browser.invalidate_device(device_id)  # type: ignore[attr-defined]
         flash("Gerät gelöscht.", "info")
     else:
         flash("Gerät konnte nicht gelöscht werden.", "danger")
@@ -136,13 +182,20 @@ def device_detail(device_id: str) -> Response:
     sources: Optional[Dict[str, Any]] = None
     errors: list[str] = []
 
-    try:
-        client = _client_from_device(device)
-        state = client.get_state()
-        config = client.get_config()
-        sources = client.list_sources()
-    except RemoteAPIError as exc:
-        errors.append(str(exc))
+    cache = current_app.cache  # type: ignore[attr-defined]
+    overview = cache.get(device_key(device.id, "overview"))
+    if overview is not None:
+        state, config, sources = overview["state"], overview["config"], overview["sources"]
+    else:
+        try:
+            client = _client_from_device(device)
+            state, config, sources = client.get_overview()
+        except RemoteAPIError as exc:
+            errors.append(str(exc))
+        else:
+            ttl = float(current_app.config.get("STATE_CACHE_TTL", 5))
+            cache.set(device_key(device.id, "overview"), {"state": state, "config": config, "sources": sources}, ttl)
+            cache.set(device_key(device.id, "state"), state, ttl)
 
     return render_template(
         "devices/detail.html",
@@ -162,14 +215,18 @@ def device_player(device_id: str) -> Response:
         flash("Unbekannte Aktion.", "danger")
         return redirect(url_for("dashboard.device_detail", device_id=device_id))
 
-    return _invoke_device_action(device_id, lambda client: client.trigger_player_action(action))
+    return _invoke_device_action(
+        device_id, "player", {"action": action}, lambda client: client.trigger_player_action(action)
+    )
 
 
 @bp.route("/devices/<device_id>/info-screen", methods=["POST"])
 @login_required
 def device_info_screen(device_id: str) -> Response:
     enabled = request.form.get("enabled") == "true"
-    return _invoke_device_action(device_id, lambda client: client.toggle_info_screen(enabled))
+    return _invoke_device_action(
+        device_id, "info_screen", {"enabled": enabled}, lambda client: client.toggle_info_screen(enabled)
+    )
 
 
 @bp.route("/devices/<device_id>/playback", methods=["POST"])
@@ -183,7 +240,7 @@ def device_playback(device_id: str) -> Response:
         "image_rotation": _safe_int(request.form.get("image_rotation")),
     }
     cleaned = {key: value for key, value in payload.items() if value not in {None, ""}}
-    return _invoke_device_action(device_id, lambda client: client.set_playback(cleaned))
+    return _invoke_device_action(device_id, "playback", cleaned, lambda client: client.set_playback(cleaned))
 
 
 @bp.route("/devices/<device_id>/sources", methods=["POST"])
@@ -201,7 +258,7 @@ def device_sources_create(device_id: str) -> Response:
         "auto_scan": request.form.get("auto_scan") == "on",
     }
     cleaned = {key: value for key, value in payload.items() if value not in {None, ""}}
-    return _invoke_device_action(device_id, lambda client: client.create_source(cleaned))
+    return _invoke_device_action(device_id, "source.create", cleaned, lambda client: client.create_source(cleaned))
 
 
 @bp.route("/devices/<device_id>/sources/<name>/update", methods=["POST"])
@@ -218,52 +275,120 @@ def device_sources_update(device_id: str, name: str) -> Response:
     }
     cleaned = {key: value for key, value in payload.items() if value not in {None, ""}}
     cleaned.setdefault("name", name)
-    return _invoke_device_action(device_id, lambda client: client.update_source(name, cleaned))
+    return _invoke_device_action(
+        device_id,
+        "source.update",
+        cleaned,
+        lambda client: client.update_source(name, cleaned),
+        on_success=lambda: current_app.media_browser.invalidate_device(device_id),  # type: ignore[attr-defined]
+    )
 
 
 @bp.route("/devices/<device_id>/sources/<name>/delete", methods=["POST"])
 @login_required
 def device_sources_delete(device_id: str, name: str) -> Response:
-    return _invoke_device_action(device_id, lambda client: client.delete_source(name))
+    return _invoke_device_action(
+        device_id,
+        "source.delete",
+        {"name": name},
+        lambda client: client.delete_source(name),
+        on_success=lambda: current_app.media_browser.invalidate_device(device_id),  # type: ignore[attr-defined]
+    )
 
 
 @bp.route("/devices/<device_id>/preview")
 @login_required
 def device_preview(device_id: str) -> Response:
+    # Only used as <img> source: errors are plain status codes, never a flash
+    # message plus a redirect to a page the browser would fetch as an image.
     storage = current_app.storage  # type: ignore[attr-defined]
     device = storage.get(device_id)
     if not device:
-        flash("Gerät nicht gefunden.", "danger")
-        return redirect(url_for("dashboard.index"))
+        return Response("Gerät nicht gefunden", status=404, mimetype="text/plain")
 
     source = request.args.get("source")
     media_path = request.args.get("path")
     if not source or not media_path:
-        flash("Vorschau-Parameter fehlen.", "warning")
-        return redirect(url_for("dashboard.device_detail", device_id=device_id))
+        return Response("Vorschau-Parameter fehlen", status=400, mimetype="text/plain")
 
     try:
         client = _client_from_device(device)
-        content = client.fetch_preview(source, media_path)
+        content = current_app.media_browser.preview(device.id, client, source, media_path)  # type: ignore[attr-defined]
     except RemoteAPIError as exc:
-        flash(str(exc), "danger")
-        return redirect(url_for("dashboard.device_detail", device_id=device_id))
-    return Response(content, mimetype="image/jpeg")
+        response = Response(str(exc), status=404 if exc.status_code == 404 else 502, mimetype="text/plain")
+        response.headers["Cache-Control"] = f"private, max-age={int(current_app.config.get('PREVIEW_ERROR_TTL', 60))}"
+        return response
+    response = Response(content, mimetype="image/jpeg")
+    response.headers["Cache-Control"] = f"private, max-age={int(current_app.config.get('PREVIEW_CACHE_TTL', 600))}"
+    return response
 
 
-def _invoke_device_action(device_id: str, func: Callable[[SlideshowClient], Any]) -> Response:
+@bp.route("/devices/<device_id>/sources/<name>/browse")
+@login_required
+def device_browse(device_id: str, name: str) -> Response:
     storage = current_app.storage  # type: ignore[attr-defined]
     device = storage.get(device_id)
     if not device:
         flash("Gerät nicht gefunden.", "danger")
         return redirect(url_for("dashboard.devices"))
 
+    path = request.args.get("path", "").strip("/")
+    page_number = _safe_int(request.args.get("page")) or 1
+    per_page = int(current_app.config.get("MEDIA_PAGE_SIZE", 60))
+    page: Optional[MediaPage] = None
+    errors: list[str] = []
+    try:
+        client = _client_from_device(device)
+        entries = current_app.media_browser.list_directory(  # type: ignore[attr-defined]
+            device.id, client, name, path, refresh=request.args.get("refresh") == "1"
+        )
+        page = paginate(entries, page_number, per_page)
+    except RemoteAPIError as exc:
+        errors.append(str(exc))
+
+    crumbs = []
+    parts = path.split("/") if path else []
+    for index, part in enumerate(parts):
+        crumbs.append((part, "/".join(parts[: index + 1])))
+    return render_template(
+        "devices/browse.html",
+        device=device,
+        source=name,
+        path=path,
+        crumbs=crumbs,
+        page=page,
+        errors=errors,
+    )
+
+
+def _invoke_device_action(
+    device_id: str,
+    action: str,
+    payload: Dict[str, Any],
+    func: Callable[[SlideshowClient], Any],
+    on_success: Optional[Callable[[], None]] = None,
+) -> Response:
+    storage = current_app.storage  # type: ignore[attr-defined]
+    device = storage.get(device_id)
+    if not device:
+        flash("Gerät nicht gefunden.", "danger")
+        return redirect(url_for("dashboard.devices"))
+
+    started = time.perf_counter()
     try:
         client = _client_from_device(device)
         func(client)
-        flash("Aktion erfolgreich.", "success")
     except RemoteAPIError as exc:
-        flash(str(exc), "danger")
+        result, message = "error", str(exc)
+        flash(message, "danger")
+    else:
+        result, message = "ok", ""
+        if on_success is not None:
+            on_success()
+        flash("Aktion erfolgreich.", "success")
+    latency_ms = (time.perf_counter() - started) * 1000
+    audit(action, device_id=device_id, payload=payload, result=result, message=message, latency_ms=latency_ms)
+    forget_device_state(current_app.cache, device_id)  # type: ignore[attr-defined]
     return redirect(url_for("dashboard.device_detail", device_id=device_id))
 
 
@@ -0,0 +1,65 @@
+"""Shared fixtures: an app on a temporary data directory and a test client."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pytest
+
+from slideshow_manager import create_app
+
+
+@pytest.fixture()
+def make_app(tmp_path: Path) -> Callable[..., Any]:
+    """Build apps on the test's data directory; keyword arguments override the config."""
+
+    def factory(**overrides: Any):
+        return create_app(
+            {
+                "TESTING": True,
+                "SECRET_KEY": "test-secret",
+                "STORAGE_PATH": str(tmp_path / "devices.json"),
+                "AUTH_MODE": "static",
+                "TEST_USERS": {"tester": "secret"},
+                "REMOTE_TIMEOUT": 2,
+                **overrides,
+            }
+        )
+
+    return factory
+
+
+@pytest.fixture()
+def app_config() -> Dict[str, Any]:
+    """Extra settings for the ``app`` fixture; override it in a test module."""
+
+    return {}
+
+
+@pytest.fixture()
+def app(make_app, app_config):
+    app = make_app(**app_config)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+def _login(client):
+    response = client.post(
+        "/login",
+        data={"username": "tester", "password": "secret"},
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+    return response
+
+
+@pytest.fixture()
+def login() -> Callable[[Any], Any]:
+    """``login(client)`` signs in as the static test user."""
+
+    return _login
@@ -0,0 +1,85 @@
+"""Tests for the batched audit log."""
+from __future__ import annotations
+
+import sqlite3
+import time
+from pathlib import Path
+
+import responses
+
+from slideshow_manager.audit import AuditLog, diff_dicts
+
+
+def test_audit_log_batches_and_filters(tmp_path: Path) -> None:
+    log = AuditLog(str(tmp_path / "audit.sqlite3"), batch_size=50, flush_interval=10)
+    for index in range(120):
+        log.record("player", user="tester", device_id=f"dev{index % 3}", payload={"action": "start"}, latency_ms=5)
+    log.record("source.create", user="tester", device_id="dev0", payload={"name": "nas", "password": "geheim"})
+    log.flush()
+
+    entries = log.query(device_id="dev0")
+    assert len(entries) == 41
+    assert entries[0]["action"] == "source.create"
+    assert entries[0]["payload"] == {"name": "nas", "password": "***"}
+    assert log.query(since=time.time() + 60) == []
+    assert len(log.query(until=time.time() + 1, limit=500)) == 121
+
+    plan = log._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM audit WHERE device_id = ? AND ts >= ? ORDER BY ts DESC", ("dev0", 0)
+    ).fetchall()
+    assert "audit_device_ts" in str(plan)
+    log.close()
+
+
+class _FlakyConnection:
+    """Connection proxy whose first insert fails like a locked database."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+        self.failures = 1
+
+    def __getattr__(self, name: str):
+        return getattr(self.connection, name)
+
+    def executemany(self, sql: str, rows):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.connection.executemany(sql, rows)
+
+
+def test_audit_write_retries_and_logs_failures(tmp_path: Path, caplog) -> None:
+    log = AuditLog(str(tmp_path / "audit.sqlite3"), retries=2)
+    row = (time.time(), "tester", "dev0", "player", None, None, "ok", "", None)
+
+    assert log._write(_FlakyConnection(log._connect()), [row])
+    assert len(log.query()) == 1
+
+    log.retries = 1
+    assert not log._write(_FlakyConnection(log._connect()), [row])
+    assert "1 Audit-Einträge verworfen" in caplog.text
+
+
+def test_diff_masks_passwords() -> None:
+    before = {"name": "Pi", "password": "alt", "tags": []}
+    after = {"name": "Pi 2", "password": "neu", "tags": []}
+    assert diff_dicts(before, after) == {"name": ["Pi", "Pi 2"], "password": ["***", "***"]}
+
+
+@responses.activate
+def test_device_actions_are_audited(app, client, login) -> None:
+    login(client)
+    client.post("/devices/new", data={"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw"})
+    device = app.storage.list_devices()[0]  # type: ignore[attr-defined]
+    responses.add(responses.POST, "https://pi.local/login", headers={"Set-Cookie": "session=abc"}, json={"status": "ok"})
+    responses.add(responses.POST, "https://pi.local/api/player/start", status=500, json={"error": "kaputt"})
+    client.post(f"/devices/{device.id}/player", data={"action": "start"})
+
+    page = client.get(f"/audit?device={device.id}")
+    assert page.status_code == 200
+    entries = app.audit.query(device_id=device.id)  # type: ignore[attr-defined]
+    assert [entry["action"] for entry in entries] == ["player", "device.create"]
+    action, created = entries
+    assert action["user"] == "tester" and action["result"] == "error"
+    assert action["payload"] == {"action": "start"} and action["latency_ms"] >= 0
+    assert created["diff"]["password"] == [None, "***"]
@@ -0,0 +1,88 @@
+"""Tests for the shared cache backends."""
+from __future__ import annotations
+
+import multiprocessing
+import time
+from pathlib import Path
+
+import pytest
+import responses
+
+from slideshow_manager.cache import MemoryCache, SQLiteCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request: pytest.FixtureRequest, tmp_path: Path):
+    if request.param == "memory":
+        return MemoryCache(max_entries=3)
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=3, evict_every=1)
+
+
+def test_cache_ttl_prefix_and_eviction(cache) -> None:
+    cache.set("device|a|state", {"status": "ok"}, ttl=60)
+    cache.set("device|a|preview|x", b"\x00img", ttl=60)
+    cache.set("device|b|state", [1, 2], ttl=0.05)
+
+    assert cache.get("device|a|state") == {"status": "ok"}
+    assert cache.get("device|a|preview|x") == b"\x00img"
+    time.sleep(0.1)
+    assert cache.get("device|b|state") is None
+
+    cache.delete_prefix("device|a|")
+    assert cache.get("device|a|state") is None and cache.get("device|a|preview|x") is None
+
+    for index in range(5):
+        cache.set(f"key{index}", index, ttl=60 + index)
+    assert cache.get("key0") is None
+    assert cache.get("key4") == 4
+
+
+def _write_from_child(path: str) -> None:
+    SQLiteCache(path).set("shared", {"from": "child"}, ttl=60)
+
+
+def test_sqlite_cache_is_shared_between_processes(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path)
+    process = multiprocessing.get_context("fork").Process(target=_write_from_child, args=(path,))
+    process.start()
+    process.join(timeout=10)
+
+    assert process.exitcode == 0
+    assert cache.get("shared") == {"from": "child"}
+
+
+@responses.activate
+def test_workers_share_device_state(make_app, login) -> None:
+    # Two apps on the same data directory behave like two gunicorn workers.
+    first, second = make_app(STATE_CACHE_TTL=60), make_app(STATE_CACHE_TTL=60)
+    first.storage.add({"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw"})  # type: ignore[attr-defined]
+    responses.add(
+        responses.POST,
+        "https://pi.local/login",
+        headers={"Set-Cookie": "session=abc"},
+        json={"status": "ok"},
+    )
+    state = responses.add(responses.GET, "https://pi.local/api/state", json={"primary_media_path": "bild.jpg"})
+
+    for app in (first, second):
+        client = app.test_client()
+        login(client)
+        assert b"bild.jpg" in client.get("/").data
+
+    assert state.call_count == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_cache_respects_byte_budget(backend: str, tmp_path: Path) -> None:
+    if backend == "memory":
+        cache = MemoryCache(max_entries=100, max_bytes=1000)
+    else:
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=100, evict_every=1, max_bytes=1000)
+
+    for index in range(5):
+        cache.set(f"preview{index}", bytes(400), ttl=60 + index)
+    cache.set("huge", bytes(2000), ttl=600)
+
+    assert cache.get("huge") is None
+    assert [cache.get(f"preview{index}") is not None for index in range(5)] == [False, False, False, True, True]
@@ -0,0 +1,104 @@
+"""Tests for the network discovery helpers."""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+import responses
+
+from slideshow_manager import discovery
+from slideshow_manager.discovery import DiscoveredPlayer, DiscoveryError, expand_targets, scan
+
+
+def test_expand_targets_accepts_ranges_and_hosts() -> None:
+    hosts = expand_targets(["10.0.0.0/30, pi.local", "10.0.0.1"])
+    assert hosts == ["10.0.0.1", "10.0.0.2", "pi.local"]
+    assert len(expand_targets(["10.1.0.0/22"])) == 1022
+
+    with pytest.raises(DiscoveryError):
+        expand_targets(["10.0.0.0/16"], max_hosts=4096)
+    with pytest.raises(DiscoveryError):
+        expand_targets(["not/a/range"])
+
+
+@responses.activate
+def test_scan_identifies_players(monkeypatch: pytest.MonkeyPatch) -> None:
+    open_hosts = {"10.0.0.5", "10.0.0.6"}
+    monkeypatch.setattr(discovery, "_port_open", lambda host, port, timeout: host in open_hosts)
+    monkeypatch.setattr(discovery, "_reverse_lookup", lambda host, timeout=1.0: "")
+    responses.add(responses.GET, "http://10.0.0.5/login", body="<form>")
+    responses.add(responses.GET, "http://10.0.0.5/api/state", status=401)
+    # Some other web server: /login exists but no slideshow API.
+    responses.add(responses.GET, "http://10.0.0.6/login", body="<form>")
+    responses.add(responses.GET, "http://10.0.0.6/api/state", status=404)
+
+    players = scan(expand_targets(["10.0.0.0/22"]), timeout=0.2)
+
+    assert [player.base_url for player in players] == ["http://10.0.0.5"]
+    assert players[0].suggested_name == "Player 10.0.0.5"
+
+
+def test_discover_import_adds_selected_devices(app, client, login) -> None:
+    app.storage.add({"name": "Alt", "base_url": "http://10.0.0.5", "username": "pi"})  # type: ignore[attr-defined]
+    login(client)
+
+    response = client.post(
+        "/devices/discover/import",
+        data={
+            "base_url": ["http://10.0.0.5", "http://10.0.0.7"],
+            "name::http://10.0.0.7": "Foyer",
+            "username": "pi",
+            "password": "pw",
+            "tags": "foyer",
+        },
+        follow_redirects=True,
+    )
+
+    assert response.status_code == 200
+    devices = {device.base_url: device for device in app.storage.list_devices()}  # type: ignore[attr-defined]
+    assert devices["http://10.0.0.5"].name == "Alt"
+    assert devices["http://10.0.0.7"].name == "Foyer"
+    assert devices["http://10.0.0.7"].tags == ["foyer"]
+
+
+@pytest.mark.parametrize("app_config", [{"DISCOVERY_MAX_PROBES": 600}])
+def test_discover_runs_scan_in_background(app, client, login, monkeypatch: pytest.MonkeyPatch) -> None:
+    found = DiscoveredPlayer(host="10.0.0.5", port=80, base_url="http://10.0.0.5", hostname="", version="")
+    monkeypatch.setattr(discovery, "scan", lambda hosts, *args: [found])
+    login(client)
+
+    # 510 hosts on two ports exceed the probe limit although the host count does not.
+    response = client.post("/devices/discover", data={"targets": "10.0.0.0/23", "ports": "80,8080"})
+    assert response.status_code == 200
+    assert "Zu viele Prüfungen" in response.get_data(as_text=True)
+
+    response = client.post("/devices/discover", data={"targets": "10.0.0.0/24", "ports": "80"})
+    assert response.status_code == 302
+    result_url = response.headers["Location"]
+    for _ in range(50):
+        page = client.get(result_url).get_data(as_text=True)
+        if "Suche läuft" not in page:
+            break
+        time.sleep(0.05)
+    assert "http://10.0.0.5" in page and "1 Player gefunden" in page
+    assert client.get("/devices/discover/unbekannt", follow_redirects=True).status_code == 200
+
+
+def test_only_one_scan_runs_at_a_time(app, client, login, monkeypatch: pytest.MonkeyPatch) -> None:
+    release = threading.Event()
+    monkeypatch.setattr(discovery, "scan", lambda hosts, *args: release.wait(5) and [])
+    login(client)
+    form = {"targets": "10.0.0.0/30", "ports": "80"}
+
+    first = client.post("/devices/discover", data=form)
+    assert first.status_code == 302
+    second = client.post("/devices/discover", data=form)
+    assert "Es läuft bereits eine Suche" in second.get_data(as_text=True)
+
+    release.set()
+    for _ in range(50):
+        if "Suche läuft" not in client.get(first.headers["Location"]).get_data(as_text=True):
+            break
+        time.sleep(0.05)
+    assert client.post("/devices/discover", data=form).status_code == 302
@@ -0,0 +1,185 @@
+"""Tests for the batching gateway transport."""
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+import responses
+
+from slideshow_manager.clients import (
+    GatewayTransport,
+    RemoteAPIError,
+    RemoteCall,
+    RemoteDevice,
+    execute_locally,
+    fetch_states,
+)
+from slideshow_manager.gateway import GatewayConfigError, create_gateway_app
+
+
+def _register_player(host: str, state: dict) -> None:
+    responses.add(
+        responses.POST,
+        f"https://{host}/login",
+        headers={"Set-Cookie": "session=abc"},
+        json={"status": "ok"},
+    )
+    responses.add(responses.GET, f"https://{host}/api/state", json=state)
+
+
+@pytest.fixture()
+def gateway():
+    """Route gateway HTTP traffic into a local gateway app."""
+
+    gateway_app = create_gateway_app(
+        {"TESTING": True, "GATEWAY_TOKEN": "t0ken", "GATEWAY_ALLOWED_TARGETS": ".local, 10.20.0.0/16"}
+    )
+    gateway_client = gateway_app.test_client()
+    batches: list[dict] = []
+
+    def forward(request):
+        batches.append(json.loads(request.body))
+        result = gateway_client.post(
+            "/api/batch",
+            data=request.body,
+            headers={"Content-Type": "application/json", **dict(request.headers)},
+        )
+        return result.status_code, {}, result.data
+
+    responses.add_callback(responses.POST, "https://gw.local/api/batch", callback=forward)
+    return batches
+
+
+@responses.activate
+def test_gateway_batches_states_in_one_request(gateway) -> None:
+    _register_player("pi1.local", {"primary_status": "playing"})
+    _register_player("pi2.local", {"primary_status": "stopped"})
+
+    devices = [
+        RemoteDevice("https://pi1.local", "pi", "pw"),
+        RemoteDevice("https://pi2.local", "pi", "pw"),
+        RemoteDevice("https://pi3.local", "pi", "pw"),
+    ]
+    states = fetch_states(devices, GatewayTransport("https://gw.local", "t0ken"), timeout=2)
+
+    assert len(gateway) == 1
+    assert states[0] == {"primary_status": "playing"}
+    assert states[1] == {"primary_status": "stopped"}
+    assert isinstance(states[2], RemoteAPIError)
+
+
+@responses.activate
+def test_gateway_rejects_wrong_token(gateway) -> None:
+    transport = GatewayTransport("https://gw.local", "wrong")
+    with pytest.raises(RemoteAPIError) as excinfo:
+        fetch_states([RemoteDevice("https://pi1.local", "pi", "pw")], transport, timeout=2)
+    assert excinfo.value.status_code == 403
+
+
+@responses.activate
+def test_dashboard_uses_gateway_transport(make_app, login, gateway) -> None:
+    app = make_app(REMOTE_TRANSPORT="gateway", GATEWAY_URL="https://gw.local", GATEWAY_TOKEN="t0ken")
+    for index in (1, 2):
+        app.storage.add(  # type: ignore[attr-defined]
+            {"name": f"Pi {index}", "base_url": f"https://pi{index}.local", "username": "pi", "password": "pw"}
+        )
+        _register_player(f"pi{index}.local", {"primary_media_path": f"bild{index}.jpg"})
+
+    client = app.test_client()
+    login(client)
+    response = client.get("/")
+
+    assert response.status_code == 200
+    assert b"bild1.jpg" in response.data and b"bild2.jpg" in response.data
+    assert len(gateway) == 1
+    assert len(gateway[0]["calls"]) == 2
+
+
+def test_gateway_requires_token_and_targets() -> None:
+    with pytest.raises(GatewayConfigError):
+        create_gateway_app({"GATEWAY_TOKEN": "", "GATEWAY_ALLOWED_TARGETS": "10.0.0.0/8"})
+    with pytest.raises(GatewayConfigError):
+        create_gateway_app({"GATEWAY_TOKEN": "t0ken", "GATEWAY_ALLOWED_TARGETS": ""})
+
+
+@responses.activate
+def test_gateway_only_forwards_allowed_targets(gateway) -> None:
+    _register_player("10.20.1.5", {"primary_status": "playing"})
+    devices = [
+        RemoteDevice("https://10.20.1.5", "pi", "pw"),
+        RemoteDevice("https://192.168.1.1", "admin", "admin"),
+        RemoteDevice("https://intranet.example.org", "pi", "pw"),
+    ]
+    states = fetch_states(devices, GatewayTransport("https://gw.local", "t0ken"), timeout=2)
+
+    assert states[0] == {"primary_status": "playing"}
+    assert all(isinstance(state, RemoteAPIError) and state.status_code == 403 for state in states[1:])
+
+
+@responses.activate
+def test_batch_deadline_returns_finished_calls() -> None:
+    _register_player("fast.local", {"primary_status": "playing"})
+
+    def slow_login(request):
+        time.sleep(1)
+        return 200, {"Set-Cookie": "session=abc"}, "{}"
+
+    responses.add_callback(responses.POST, "https://slow.local/login", callback=slow_login)
+    calls = [
+        RemoteCall(RemoteDevice("https://slow.local", "pi", "pw"), "GET", "/api/state"),
+        RemoteCall(RemoteDevice("https://fast.local", "pi", "pw"), "GET", "/api/state"),
+    ]
+    started = time.monotonic()
+    slow, fast = execute_locally(calls, timeout=5, deadline=0.3)
+
+    assert time.monotonic() - started < 0.9
+    assert isinstance(slow, RemoteAPIError) and slow.status_code == 504
+    assert fast.json() == {"primary_status": "playing"}
+
+
+@responses.activate
+def test_gateway_refuses_paths_outside_the_api(gateway) -> None:
+    _register_player("pi1.local", {"primary_status": "playing"})
+    admin = responses.add(responses.GET, "https://pi1.local/admin", body="geheim")
+    device = RemoteDevice("https://pi1.local", "pi", "pw")
+    paths = ["/api/../admin", "/api/%2e%2e/admin", "/media/..\\admin", "//evil.local/api/state", "/login-admin"]
+    results = GatewayTransport("https://gw.local", "t0ken").request_many(
+        [RemoteCall(device, "GET", path) for path in paths] + [RemoteCall(device, "GET", "/api/state?path=a/../b")], 2
+    )
+
+    assert all(isinstance(result, RemoteAPIError) and result.status_code == 403 for result in results[:-1])
+    assert results[-1].status_code == 200
+    assert admin.call_count == 0
+
+
+@responses.activate
+def test_gateway_does_not_follow_device_redirects(gateway) -> None:
+    _register_player("pi1.local", {})
+    responses.replace(
+        responses.GET, "https://pi1.local/api/state", status=302, headers={"Location": "https://intern.example/"}
+    )
+    intern = responses.add(responses.GET, "https://intern.example/", body="intern")
+    call = RemoteCall(RemoteDevice("https://pi1.local", "pi", "pw"), "GET", "/api/state")
+    (result,) = GatewayTransport("https://gw.local", "t0ken").request_many([call], 2)
+
+    assert result.status_code == 302
+    assert intern.call_count == 0
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        [],
+        {"calls": "abc"},
+        {"calls": ["abc"]},
+        {"calls": [], "timeout": "x"},
+        {"calls": [], "deadline": -1},
+    ],
+)
+def test_gateway_rejects_malformed_batches(body) -> None:
+    gateway_app = create_gateway_app({"TESTING": True, "GATEWAY_TOKEN": "t0ken", "GATEWAY_ALLOWED_TARGETS": ".local"})
+    response = gateway_app.test_client().post("/api/batch", json=body, headers={"X-Gateway-Token": "t0ken"})
+
+    assert response.status_code == 400
+    assert "Ungültiger Batch" in response.get_json()["message"]
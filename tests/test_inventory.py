@@ -0,0 +1,79 @@
+"""Tests for inventory import and export."""
+from __future__ import annotations
+
+import getpass
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from slideshow_manager.__main__ import main
+from slideshow_manager.audit import AuditLog
+from slideshow_manager.inventory import export_rows, import_devices
+from slideshow_manager.storage import DeviceStorage
+
+
+CSV_INPUT = """name,base_url,username,password,tags
+Foyer,https://pi1.local,pi,pw,"foyer, eg"
+Kantine,https://pi2.local,pi,,
+Ohne URL,,pi,pw,
+Kaputt,ftp://pi3.local,pi,pw,
+"""
+
+
+def test_csv_import_upserts_and_reports_errors(tmp_path: Path) -> None:
+    storage = DeviceStorage(str(tmp_path / "devices.json"))
+    existing = storage.add({"name": "Alt", "base_url": "https://pi2.local/", "username": "admin", "password": "keep"})
+
+    report = import_devices(storage, io.StringIO(CSV_INPUT), "csv")
+
+    assert (report.created, report.updated) == (1, 1)
+    assert [row for row, _ in report.errors] == [4, 5]
+    devices = {device.base_url.rstrip("/"): device for device in storage.list_devices()}
+    assert devices["https://pi1.local"].tags == ["foyer", "eg"]
+    assert devices["https://pi2.local"].id == existing.id
+    assert devices["https://pi2.local"].name == "Kantine"
+    assert devices["https://pi2.local"].password == "keep"
+
+
+def test_jsonl_round_trip(tmp_path: Path) -> None:
+    source = DeviceStorage(str(tmp_path / "a.json"))
+    source.add({"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw", "tags": ["x"]})
+    exported = "".join(export_rows(source.iter_devices(), "jsonl"))
+
+    target = DeviceStorage(str(tmp_path / "b.json"))
+    report = import_devices(target, io.StringIO(exported + "{broken\n"), "jsonl")
+
+    assert report.created == 1
+    assert report.errors[0][0] == 2
+    assert [device.to_dict() for device in target.list_devices()] == [
+        device.to_dict() for device in source.list_devices()
+    ]
+
+
+def test_export_endpoint_streams_csv(app, client, login) -> None:
+    app.storage.add({"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw"})  # type: ignore[attr-defined]
+    login(client)
+
+    response = client.get("/devices/export?format=csv&passwords=0")
+
+    assert response.is_streamed
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "id,name,base_url,username,notes,tags"
+    assert "https://pi.local" in lines[1] and "pw" not in lines[1]
+
+
+def test_cli_import_and_export(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    storage_path = str(tmp_path / "devices.json")
+    source = tmp_path / "devices.jsonl"
+    source.write_text(json.dumps({"name": "Pi", "base_url": "https://pi.local", "username": "pi"}) + "\n")
+
+    assert main(["--storage", storage_path, "import", str(source)]) == 0
+    assert "1 angelegt" in capsys.readouterr().out
+    entries = AuditLog(str(tmp_path / "audit.sqlite3")).query()
+    assert [(entry["action"], entry["user"]) for entry in entries] == [("device.import", getpass.getuser())]
+    assert entries[0]["diff"]["name"] == [None, "Pi"]
+
+    assert main(["--storage", storage_path, "export", "--format", "jsonl"]) == 0
+    assert json.loads(capsys.readouterr().out)["name"] == "Pi"
@@ -0,0 +1,45 @@
+"""Tests for the load test mode against simulated players."""
+from __future__ import annotations
+
+from slideshow_manager.__main__ import main
+from slideshow_manager.storage import DeviceStorage
+from slideshow_manager.loadtest import SESSION_STEPS, LocalManager, format_report, percentile, run
+
+
+def test_percentile_nearest_rank() -> None:
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.95) == 0
+
+
+def test_ramped_run_reports_stages_and_steps() -> None:
+    report, manager_url = run(
+        [1, 2], stage_seconds=0.5, players=4, latency=0.0, bulk_size=2, interval=0.5, workers=1
+    )
+
+    assert manager_url.startswith("http://127.0.0.1:")
+    assert [stage.label for stage in report.stages] == ["1", "2"]
+    assert sum(stage.requests for stage in report.stages) > 0
+    assert [step.label for step in report.steps] == list(SESSION_STEPS)
+    assert all(step.errors == 0 for step in report.steps)
+    assert report.ceiling is not None and report.rss_end_kb is not None
+    assert "Durchsatzgrenze" in format_report(report)
+
+
+def test_cli_rejects_invalid_stages(capsys) -> None:
+    assert main(["loadtest", "--stages", "0,2"]) == 2
+    assert "Stufen" in capsys.readouterr().err
+
+
+def test_run_against_existing_manager_removes_seeded_devices() -> None:
+    manager = LocalManager("loadtest", "loadtest", workers=2).start()
+    try:
+        report, manager_url = run(
+            [1], stage_seconds=0.3, players=3, latency=0.0, interval=0.3, manager_url=manager.url, farm_host="127.0.0.1"
+        )
+        assert manager_url == manager.url
+        assert sum(stage.requests for stage in report.stages) > 0
+        assert DeviceStorage(manager.storage_path).list_devices() == []
+    finally:
+        manager.stop()
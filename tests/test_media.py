@@ -0,0 +1,108 @@
+"""Tests for the cached media browser."""
+from __future__ import annotations
+
+import pytest
+import responses
+
+
+@pytest.fixture()
+def app_config():
+    return {"MEDIA_PAGE_SIZE": 2}
+
+
+@responses.activate
+def test_browse_paginates_cached_listing(app, client, login) -> None:
+    device = app.storage.add(  # type: ignore[attr-defined]
+        {"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw"}
+    )
+    responses.add(
+        responses.POST,
+        "https://pi.local/login",
+        headers={"Set-Cookie": "session=abc"},
+        json={"status": "ok"},
+    )
+    listing = responses.add(
+        responses.GET,
+        "https://pi.local/api/sources/share/browse?path=fotos",
+        json={
+            "entries": [
+                {"name": "b.jpg"},
+                {"name": "2023", "type": "directory"},
+                {"name": "a.png"},
+            ]
+        },
+    )
+    preview = responses.add(responses.GET, "https://pi.local/media/preview/share/fotos/a.png", body=b"img")
+
+    login(client)
+
+    first = client.get(f"/devices/{device.id}/sources/share/browse?path=fotos")
+    second = client.get(f"/devices/{device.id}/sources/share/browse?path=fotos&page=2")
+
+    assert b"2023" in first.data and b"a.png" in first.data and b"b.jpg" not in first.data
+    assert b"b.jpg" in second.data and b"Seite 2 von 2" in second.data
+    assert listing.call_count == 1
+
+    for _ in range(2):
+        response = client.get(f"/devices/{device.id}/preview?source=share&path=fotos/a.png")
+        assert response.data == b"img"
+        assert "max-age" in response.headers["Cache-Control"]
+    assert preview.call_count == 1
+
+    client.get(f"/devices/{device.id}/sources/share/browse?path=fotos&refresh=1")
+    assert listing.call_count == 2
+
+
+@responses.activate
+def test_source_delete_invalidates_listing_only_on_success(app, client, login) -> None:
+    device = app.storage.add(  # type: ignore[attr-defined]
+        {"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw"}
+    )
+    responses.add(
+        responses.POST,
+        "https://pi.local/login",
+        headers={"Set-Cookie": "session=abc"},
+        json={"status": "ok"},
+    )
+    listing = responses.add(
+        responses.GET, "https://pi.local/api/sources/share/browse", json={"entries": [{"name": "a.jpg"}]}
+    )
+    responses.add(responses.DELETE, "https://pi.local/api/sources/share", status=500, json={"message": "belegt"})
+    responses.add(responses.DELETE, "https://pi.local/api/sources/share", json={"status": "ok"})
+
+    login(client)
+    browse_url = f"/devices/{device.id}/sources/share/browse"
+
+    client.get(browse_url)
+    client.post(f"/devices/{device.id}/sources/share/delete")
+    client.get(browse_url)
+    assert listing.call_count == 1
+
+    client.post(f"/devices/{device.id}/sources/share/delete")
+    client.get(browse_url)
+    assert listing.call_count == 2
+
+
+@responses.activate
+def test_failed_preview_is_a_plain_error_and_cached(app, client, login) -> None:
+    device = app.storage.add(  # type: ignore[attr-defined]
+        {"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw"}
+    )
+    responses.add(
+        responses.POST,
+        "https://pi.local/login",
+        headers={"Set-Cookie": "session=abc"},
+        json={"status": "ok"},
+    )
+    preview = responses.add(
+        responses.GET, "https://pi.local/media/preview/share/kaputt.jpg", status=500, json={"message": "defekt"}
+    )
+    login(client)
+
+    for _ in range(3):
+        response = client.get(f"/devices/{device.id}/preview?source=share&path=kaputt.jpg")
+        assert response.status_code == 502
+        assert response.mimetype == "text/plain"
+    assert preview.call_count == 1
+    with client.session_transaction() as session:
+        assert not session.get("_flashes")
@@ -0,0 +1,181 @@
+"""Tests for cron parsing and the schedule executor."""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import responses
+
+from slideshow_manager.scheduler import CronExpression, ScheduleError, Scheduler, ScheduleStorage
+
+
+def test_cron_next_after_handles_ranges_and_weekdays() -> None:
+    expression = CronExpression("30 8 * * 1-5")
+
+    # Friday 2024-05-10 09:00 -> next run is Monday 08:30.
+    assert expression.next_after(datetime(2024, 5, 10, 9, 0)) == datetime(2024, 5, 13, 8, 30)
+    assert CronExpression("*/15 * * * *").next_after(datetime(2024, 1, 1, 0, 14, 59)) == datetime(2024, 1, 1, 0, 15)
+    assert CronExpression("@monthly").next_after(datetime(2024, 12, 5)) == datetime(2025, 1, 1)
+
+    with pytest.raises(ScheduleError):
+        CronExpression("61 * * * *")
+
+
+@responses.activate
+def test_scheduler_fires_due_actions_and_catches_up(app) -> None:
+    device = app.storage.add(  # type: ignore[attr-defined]
+        {"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw", "tags": ["foyer"]}
+    )
+    responses.add(
+        responses.POST,
+        "https://pi.local/login",
+        headers={"Set-Cookie": "session=abc"},
+        json={"status": "ok"},
+    )
+    responses.add(responses.POST, "https://pi.local/api/player/start", json={"status": "ok"})
+
+    schedules = app.schedules  # type: ignore[attr-defined]
+    schedule = schedules.add({"name": "Öffnung", "cron": "0 8 * * *", "action": "player:start", "tag": "foyer"})
+    morning = datetime(2024, 5, 10, 8, 0)
+    schedules.update(schedule.id, {"created_at": "2024-05-09T20:00:00"})
+
+    assert Scheduler(app, schedules).run_pending(morning - timedelta(minutes=1)) == 0
+    # Leader restarted five minutes after the slot: the missed run is caught up once.
+    scheduler = Scheduler(app, schedules, catchup_seconds=600)
+    assert scheduler.run_pending(morning + timedelta(minutes=5)) == 1
+    assert scheduler.run_pending(morning + timedelta(minutes=6)) == 0
+    assert scheduler.next_due() == morning + timedelta(days=1)
+
+    history = schedules.history()
+    assert history[0]["catch_up"] is True
+    assert history[0]["results"] == [{"device_id": device.id, "device_name": "Pi", "ok": True, "message": ""}]
+    assert schedules.get(schedule.id).last_run == morning.isoformat(timespec="seconds")
+
+
+@responses.activate
+def test_catch_up_after_outage_of_several_periods(app) -> None:
+    app.storage.add(  # type: ignore[attr-defined]
+        {"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw", "tags": ["foyer"]}
+    )
+    responses.add(responses.POST, "https://pi.local/login", headers={"Set-Cookie": "session=abc"}, json={})
+    start = responses.add(responses.POST, "https://pi.local/api/player/start", json={"status": "ok"})
+
+    schedules = app.schedules  # type: ignore[attr-defined]
+    schedule = schedules.add({"name": "Öffnung", "cron": "0 8 * * *", "action": "player:start", "tag": "foyer"})
+    morning = datetime(2024, 5, 10, 8, 0)
+    schedules.update(schedule.id, {"last_run": (morning - timedelta(days=3)).isoformat()})
+
+    scheduler = Scheduler(app, schedules, catchup_seconds=900)
+    assert scheduler.run_pending(morning + timedelta(minutes=5)) == 1
+    assert start.call_count == 1
+    assert schedules.history()[0]["scheduled_for"] == morning.isoformat(timespec="seconds")
+    assert scheduler.next_due() == morning + timedelta(days=1)
+
+    # Outside the window nothing is replayed; the next slot is tomorrow.
+    schedules.update(schedule.id, {"last_run": (morning - timedelta(days=3)).isoformat()})
+    late = Scheduler(app, schedules, catchup_seconds=900)
+    assert late.run_pending(morning + timedelta(hours=2)) == 0
+    assert late.next_due() == morning + timedelta(days=1)
+
+
+@responses.activate
+def test_schedule_added_by_other_worker_during_run_is_loaded(app) -> None:
+    app.storage.add(  # type: ignore[attr-defined]
+        {"name": "Pi", "base_url": "https://pi.local", "username": "pi", "password": "pw", "tags": ["foyer"]}
+    )
+    schedules = app.schedules  # type: ignore[attr-defined]
+    other_worker = ScheduleStorage(str(schedules.path))
+
+    def start_and_add_schedule(request):
+        # Another gunicorn worker saves a schedule while the batch is running.
+        added = other_worker.add({"name": "Später", "cron": "5 8 * * *", "action": "player:stop", "tag": "foyer"})
+        other_worker.update(added.id, {"created_at": "2024-05-09T20:00:00"})
+        return 200, {}, "{}"
+
+    responses.add(responses.POST, "https://pi.local/login", headers={"Set-Cookie": "session=abc"}, json={})
+    responses.add_callback(responses.POST, "https://pi.local/api/player/start", callback=start_and_add_schedule)
+    stop = responses.add(responses.POST, "https://pi.local/api/player/stop", json={"status": "ok"})
+
+    schedule = schedules.add({"name": "Öffnung", "cron": "0 8 * * *", "action": "player:start", "tag": "foyer"})
+    schedules.update(schedule.id, {"created_at": "2024-05-09T20:00:00"})
+    morning = datetime(2024, 5, 10, 8, 0)
+
+    scheduler = Scheduler(app, schedules)
+    assert scheduler.run_pending(morning) == 1
+    assert scheduler.run_pending(morning + timedelta(minutes=5)) == 1
+    assert stop.call_count == 1
+
+
+@responses.activate
+def test_broken_device_does_not_stop_schedule(app) -> None:
+    for host in ("broken.local", "pi.local"):
+        app.storage.add(  # type: ignore[attr-defined]
+            {"name": host, "base_url": f"https://{host}", "username": "pi", "password": "pw", "tags": ["foyer"]}
+        )
+        responses.add(responses.POST, f"https://{host}/login", headers={"Set-Cookie": "session=abc"}, json={})
+    responses.add(responses.POST, "https://broken.local/api/player/start", status=500, body="<html>kein JSON</html>")
+    start = responses.add(responses.POST, "https://pi.local/api/player/start", json={"status": "ok"})
+
+    schedules = app.schedules  # type: ignore[attr-defined]
+    schedule = schedules.add({"name": "Öffnung", "cron": "0 8 * * *", "action": "player:start", "tag": "foyer"})
+    morning = datetime(2024, 5, 10, 8, 0)
+    schedules.update(schedule.id, {"created_at": "2024-05-09T20:00:00"})
+
+    scheduler = Scheduler(app, schedules)
+    assert scheduler.run_pending(morning) == 1
+    assert start.call_count == 1
+    assert [result["ok"] for result in schedules.history()[0]["results"]] == [False, True]
+    assert scheduler.next_due() == morning + timedelta(days=1)
+
+
+@responses.activate
+def test_tag_schedule_is_sent_as_one_gateway_batch(app) -> None:
+    app.config.update(REMOTE_TRANSPORT="gateway", GATEWAY_URL="https://gw.local", GATEWAY_TOKEN="t0ken")
+    for index in range(3):
+        app.storage.add(  # type: ignore[attr-defined]
+            {
+                "name": f"Pi {index}",
+                "base_url": f"https://pi{index}.local",
+                "username": "pi",
+                "password": "pw",
+                "tags": ["foyer"],
+            }
+        )
+    ok = {"status_code": 200, "content_type": "application/json", "content": "e30="}
+    batch = responses.add(responses.POST, "https://gw.local/api/batch", json={"results": [ok, ok, ok]})
+
+    schedules = app.schedules  # type: ignore[attr-defined]
+    schedule = schedules.add({"name": "Aus", "cron": "0 20 * * *", "action": "info_screen:off", "tag": "foyer"})
+    schedules.update(schedule.id, {"created_at": "2024-05-09T08:00:00"})
+
+    assert Scheduler(app, schedules).run_pending(datetime(2024, 5, 10, 20, 0)) == 1
+    assert batch.call_count == 1
+    calls = json.loads(responses.calls[0].request.body)["calls"]
+    assert [call["path"] for call in calls] == ["/api/player/info-screen"] * 3
+    assert calls[0]["json"] == {"enabled": False}
+    assert all(result["ok"] for result in schedules.history()[0]["results"])
+
+
+def test_schedule_form_creates_schedule(app, client, login) -> None:
+    login(client)
+    response = client.post(
+        "/schedules",
+        data={"name": "Abend", "cron": "0 20 * * *", "target": "tag", "tag": "foyer", "action": "player:stop"},
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+    assert [schedule.name for schedule in app.schedules.list_schedules()] == ["Abend"]  # type: ignore[attr-defined]
+
+
+def test_history_is_rotated_and_read_from_the_end(tmp_path) -> None:
+    schedules = ScheduleStorage(str(tmp_path / "schedules.json"), history_max_bytes=2000)
+    for index in range(100):
+        schedules.append_history({"schedule_id": "s1", "run": index, "padding": "x" * 20})
+
+    assert schedules.history_path.stat().st_size <= 2000
+    assert schedules.rotated_history_path.exists()
+    assert [entry["run"] for entry in schedules.history(limit=3)] == [99, 98, 97]
+    # Both generations together: the newest runs without gaps, the oldest dropped.
+    runs = [entry["run"] for entry in schedules.history(limit=1000)]
+    assert runs == list(range(99, 99 - len(runs), -1)) and 30 < len(runs) < 100
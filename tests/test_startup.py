@@ -0,0 +1,42 @@
+"""Tests for lazy imports and preload/post-fork initialisation."""
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+from slideshow_manager import init_worker
+
+
+def test_create_app_does_not_import_requests(tmp_path: Path) -> None:
+    code = (
+        "import sys\n"
+        "from slideshow_manager import create_app\n"
+        f"create_app({{'STORAGE_PATH': {str(tmp_path / 'devices.json')!r}}})\n"
+        "print('requests' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_preloaded_app_starts_scheduler_after_fork(make_app) -> None:
+    app = make_app(SCHEDULER_ENABLED=True, PRELOAD_APP=True)
+    assert app.scheduler is None  # type: ignore[attr-defined]
+
+    lock = app.storage._lock  # type: ignore[attr-defined]
+    init_worker(app)
+    try:
+        assert app.scheduler is not None  # type: ignore[attr-defined]
+        assert app.storage._lock is not lock  # type: ignore[attr-defined]
+    finally:
+        app.scheduler.stop()  # type: ignore[attr-defined]
+
+
+def test_cli_does_not_import_flask() -> None:
+    code = (
+        "import sys\n"
+        "from slideshow_manager.__main__ import main\n"
+        "print(sorted(name for name in ('flask', 'requests', 'sqlite3') if name in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"